@@ -0,0 +1,322 @@
+"""
+fakes.py - Offline stand-ins for Telegram, Gemini and Supabase with configurable latency
+"""
+
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from google.api_core.exceptions import ResourceExhausted
+from telegram import CallbackQuery, Chat, Message, Update, User
+from telegram.request import BaseRequest, RequestData
+
+
+class Latency:
+    """A latency distribution in seconds: ``fixed``, ``uniform`` (0-2x mean) or ``lognormal``."""
+
+    def __init__(self, mean: float, distribution: str = "lognormal", sigma: float = 0.5) -> None:
+        self.mean = mean
+        self.distribution = distribution
+        self.sigma = sigma
+
+    def sample(self) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == "fixed":
+            return self.mean
+        if self.distribution == "uniform":
+            return random.uniform(0, 2 * self.mean)
+        # Scale so the distribution's mean stays at ``mean``
+        return random.lognormvariate(0, self.sigma) * self.mean / math.exp(self.sigma ** 2 / 2)
+
+    async def wait(self) -> None:
+        await asyncio.sleep(self.sample())
+
+
+class FakeDatabase:
+    """In-memory replacement for db.Database."""
+
+    def __init__(self, latency: Latency) -> None:
+        self.latency = latency
+        self.projects: List[Dict[str, Any]] = []
+        self.conversations: List[Dict[str, Any]] = []
+        self.summaries: Dict[int, Dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self.reads = 0
+        self.writes = 0
+
+    async def table_exists(self, table: str, column: str = "id") -> bool:
+        await self.latency.wait()
+        return True
+
+    async def get_latest_project(self, user_id: int) -> Optional[Dict[str, Any]]:
+        await self.latency.wait()
+        self.reads += 1
+        for project in reversed(self.projects):
+            if project["user_id"] == user_id:
+                return project
+        return None
+
+    async def get_recent_conversations(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        await self.latency.wait()
+        self.reads += 1
+        rows = [row for row in self.conversations if row["user_id"] == user_id]
+        return rows[-limit:]
+
+    async def chat_turn_context(self, user_id: int, history_limit: int) -> Dict[str, Any]:
+        await self.latency.wait()
+        self.reads += 1
+        project = next((row for row in reversed(self.projects) if row["user_id"] == user_id), None)
+        return {
+            "project": project,
+            "history": [row for row in self.conversations if row["user_id"] == user_id][-history_limit:],
+            "summary": self.summaries.get(project["id"]) if project else None,
+        }
+
+    async def insert_project(self, project: Dict[str, Any]) -> Dict[str, Any]:
+        await self.latency.wait()
+        self.writes += 1
+        row = {**project, "id": next(self._ids), "created_at": datetime.now(timezone.utc).isoformat()}
+        self.projects.append(row)
+        return row
+
+    async def insert_conversations(self, rows: List[Dict[str, Any]]) -> None:
+        await self.latency.wait()
+        self.writes += 1
+        for row in rows:
+            self.conversations.append({**row, "id": next(self._ids)})
+
+    async def get_conversations_after(self, project_id: int, after: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        await self.latency.wait()
+        self.reads += 1
+        rows = [
+            row for row in self.conversations
+            if row["project_id"] == project_id and (after is None or row["timestamp"] > after)
+        ]
+        return rows[:limit]
+
+    async def get_project_summary(self, project_id: int) -> Optional[Dict[str, Any]]:
+        await self.latency.wait()
+        self.reads += 1
+        return self.summaries.get(project_id)
+
+    async def upsert_project_summary(self, summary: Dict[str, Any]) -> None:
+        await self.latency.wait()
+        self.writes += 1
+        self.summaries[summary["project_id"]] = summary
+
+    async def close(self) -> None:
+        pass
+
+
+class _FakeResponse:
+    def __init__(self, text: str) -> None:
+        self.text = text
+
+
+class _FakeStream:
+    def __init__(self, words: List[str], latency: Latency) -> None:
+        self.words = words
+        self.latency = latency
+
+    async def __aiter__(self):
+        for word in self.words:
+            await asyncio.sleep(self.latency.sample() / max(len(self.words), 1))
+            yield _FakeResponse(word)
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel's async API; ``error_rate`` of calls get a 429."""
+
+    REPLY = "Your revenue plan is vague. Who pays, how much, and why would they switch? 🤔"
+
+    def __init__(self, latency: Latency, error_rate: float = 0.0) -> None:
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+
+    async def generate_content_async(self, contents: Any, stream: bool = False, **kwargs: Any):
+        self.calls += 1
+        if self.error_rate and random.random() < self.error_rate:
+            await self.latency.wait()
+            raise ResourceExhausted("Quota exceeded (simulated)")
+        if stream:
+            words = [word + " " for word in self.REPLY.split()]
+            return _FakeStream(words, self.latency)
+        await self.latency.wait()
+        return _FakeResponse(self.REPLY)
+
+
+class FakeBot:
+    """Records outgoing Telegram calls instead of making them."""
+
+    def __init__(self, latency: Latency) -> None:
+        self.latency = latency
+        self.sent = 0
+        self.edits = 0
+        self._message_ids = itertools.count(1_000_000)
+        self.me = User(id=1, first_name="Jeff Jr", is_bot=True, username="jeff_jr_bot")
+
+    def _message(self, chat_id: int, text: str) -> Message:
+        message = Message(
+            message_id=next(self._message_ids),
+            date=datetime.now(timezone.utc),
+            chat=Chat(id=chat_id, type=Chat.PRIVATE),
+            from_user=self.me,
+            text=text,
+        )
+        message.set_bot(self)
+        return message
+
+    async def send_message(self, chat_id: int, text: str, **kwargs: Any) -> Message:
+        await self.latency.wait()
+        self.sent += 1
+        return self._message(chat_id, text)
+
+    async def edit_message_text(self, text: str, chat_id: Optional[int] = None, **kwargs: Any):
+        await self.latency.wait()
+        self.edits += 1
+        return self._message(chat_id or 0, text)
+
+    async def answer_callback_query(self, callback_query_id: str, **kwargs: Any) -> bool:
+        await self.latency.wait()
+        return True
+
+
+class FakeRequest(BaseRequest):
+    """Answers Bot API calls locally, so a real Application runs with no network or token."""
+
+    BOT_USER = {"id": 1, "is_bot": True, "first_name": "Jeff Jr", "username": "jeff_jr_bot"}
+
+    def __init__(self, latency: Latency) -> None:
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1_000_000)
+
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self, url: str, method: str, request_data: Optional[RequestData] = None, **kwargs: Any
+    ) -> Tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        self.calls[endpoint] += 1
+        parameters = request_data.parameters if request_data is not None else {}
+        if endpoint == "getMe":
+            result: Any = self.BOT_USER
+        else:
+            await self.latency.wait()
+            result = True
+            if endpoint in ("sendMessage", "editMessageText"):
+                result = {
+                    "message_id": next(self._message_ids),
+                    "date": int(time.time()),
+                    "chat": {"id": int(parameters.get("chat_id", 0)), "type": "private"},
+                    "from": self.BOT_USER,
+                    "text": str(parameters.get("text", "")),
+                }
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.calls)
+
+
+class RawUpdateFactory:
+    """Builds raw webhook bodies (Bot API JSON), as Telegram would POST them."""
+
+    def __init__(self) -> None:
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def _user(self, user_id: int) -> Dict[str, Any]:
+        return {"id": user_id, "is_bot": False, "first_name": f"Founder {user_id}", "username": f"founder{user_id}"}
+
+    def _message(self, user_id: int, text: str, sender: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": sender or self._user(user_id),
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return message
+
+    def text(self, user_id: int, text: str) -> bytes:
+        return json.dumps({"update_id": next(self._update_ids), "message": self._message(user_id, text)}).encode()
+
+    def callback(self, user_id: int, data: str) -> bytes:
+        return json.dumps({
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": str(next(self._update_ids)),
+                "from": self._user(user_id),
+                "chat_instance": str(user_id),
+                "data": data,
+                "message": self._message(user_id, "stage?", sender=FakeRequest.BOT_USER),
+            },
+        }).encode()
+
+
+class UpdateFactory:
+    """Builds real telegram.Update objects bound to a FakeBot."""
+
+    def __init__(self, bot: FakeBot) -> None:
+        self.bot = bot
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+
+    def _user(self, user_id: int) -> User:
+        return User(id=user_id, first_name=f"Founder {user_id}", is_bot=False, username=f"founder{user_id}")
+
+    def _message(self, user_id: int, text: str, from_user: Optional[User] = None) -> Message:
+        message = Message(
+            message_id=next(self._message_ids),
+            date=datetime.now(timezone.utc),
+            chat=Chat(id=user_id, type=Chat.PRIVATE),
+            from_user=from_user or self._user(user_id),
+            text=text,
+        )
+        message.set_bot(self.bot)
+        return message
+
+    def text(self, user_id: int, text: str) -> Update:
+        update = Update(update_id=next(self._update_ids), message=self._message(user_id, text))
+        update.set_bot(self.bot)
+        return update
+
+    def callback(self, user_id: int, data: str) -> Update:
+        query = CallbackQuery(
+            id=str(next(self._update_ids)),
+            from_user=self._user(user_id),
+            chat_instance=str(user_id),
+            data=data,
+            message=self._message(user_id, "stage?", from_user=self.bot.me),
+        )
+        query.set_bot(self.bot)
+        update = Update(update_id=next(self._update_ids), callback_query=query)
+        update.set_bot(self.bot)
+        return update
+
+
+class FakeContext:
+    """The parts of CallbackContext the handlers use."""
+
+    def __init__(self, bot: FakeBot) -> None:
+        self.bot = bot
+        self.user_data: Dict[str, Any] = {}
+        self.error: Optional[BaseException] = None
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+load_test.py - Offline load test driving bot.py's real handlers with simulated founders
+
+Every simulated user runs the full flow (/start, name, stage button, revenue
+goal, then chat turns) through bot.py's handlers and update processor, while
+Telegram, Gemini and Supabase are replaced by local fakes with configurable
+latency. Reports throughput, per-handler latency percentiles and event-loop
+lag; --max-p99-ms makes it exit non-zero on a regression.
+
+    python -m bench.load_test --users 2000 --turns 3
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+# bot.py validates these at import time; nothing here talks to the real services
+for _name, _value in {
+    "TELEGRAM_TOKEN": "123456:offline-benchmark",
+    "GOOGLE_API_KEY": "offline-benchmark",
+    "SUPABASE_URL": "http://localhost",
+    "SUPABASE_KEY": "offline.benchmark.key",
+    "STATE_STORE_URL": "sqlite:///:memory:",
+    # Time whole chat turns inside the handler rather than debounced background turns
+    "MESSAGE_DEBOUNCE_SECONDS": "0",
+    "USER_MESSAGES_PER_MINUTE": "0",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from bench.fakes import FakeBot, FakeContext, FakeDatabase, FakeModel, Latency, UpdateFactory
+from llm import Backend
+
+QUESTIONS = [
+    "What's a good revenue model for a Solana DEX?",
+    "How do I get my first 100 users?",
+    "Should I raise a pre-seed round now or keep bootstrapping?",
+    "Is charging 0.3% per swap too much?",
+    "How do I compete with Jupiter?",
+]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes a task that asked to sleep ``interval``."""
+
+    def __init__(self, interval: float = 0.01) -> None:
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+async def simulate_user(bot_module, factory: UpdateFactory, fake_bot: FakeBot, user_id: int,
+                        turns: int, think_time: float, timings: Dict[str, List[float]],
+                        command_share: float = 0.0) -> None:
+    context = FakeContext(fake_bot)
+    processor = bot_module.update_processor
+
+    async def send(handler, update) -> None:
+        started = time.perf_counter()
+        await processor.process_update(update, handler(update, context))
+        timings[handler.__name__].append(time.perf_counter() - started)
+        if think_time:
+            await asyncio.sleep(random.uniform(0, 2 * think_time))
+
+    await send(bot_module.start, factory.text(user_id, "/start"))
+    await send(bot_module.project_name, factory.text(user_id, f"Project {user_id}"))
+    await send(bot_module.project_stage, factory.callback(user_id, random.choice(bot_module.STAGES)))
+    await send(bot_module.revenue_goal, factory.text(user_id, "$10K/month via swap fees"))
+    for _ in range(turns):
+        if random.random() < command_share:
+            # Cheap commands that should stay fast however busy Gemini is
+            if random.random() < 0.5:
+                await send(bot_module.help_command, factory.text(user_id, "/help"))
+            else:
+                await send(bot_module.review, factory.text(user_id, "/review"))
+            continue
+        await send(bot_module.handle_feedback, factory.text(user_id, random.choice(QUESTIONS)))
+
+
+async def run(args: argparse.Namespace) -> Dict:
+    import bot as bot_module
+
+    # bot.py logs every onboarding step at INFO, which would dominate the run
+    logging.getLogger().setLevel(args.log_level)
+    fake_db = FakeDatabase(Latency(args.db_latency_ms / 1000, args.distribution))
+    fake_model = FakeModel(Latency(args.llm_latency_ms / 1000, args.distribution), error_rate=args.llm_error_rate)
+    fake_bot = FakeBot(Latency(args.telegram_latency_ms / 1000, args.distribution))
+    bot_module.db = fake_db
+    if bot_module.summarizer is not None:
+        bot_module.summarizer.db = fake_db
+    bot_module.llm_pool.backends = [Backend(fake_model, name="fake")]
+    bot_module.llm_pool.fallbacks = []
+    factory = UpdateFactory(fake_bot)
+
+    timings: Dict[str, List[float]] = defaultdict(list)
+    monitor = LoopLagMonitor()
+    await bot_module.conversation_writer.start()
+    monitor.start()
+    started = time.perf_counter()
+
+    users = [
+        simulate_user(bot_module, factory, fake_bot, 10_000 + i, args.turns, args.think_ms / 1000, timings,
+                      args.command_share)
+        for i in range(args.users)
+    ]
+    await asyncio.gather(*users)
+
+    elapsed = time.perf_counter() - started
+    await monitor.stop()
+    if bot_module.summarizer is not None:
+        await bot_module.summarizer.close()
+    await bot_module.conversation_writer.close()
+
+    total = sum(len(samples) for samples in timings.values())
+    return {
+        "users": args.users,
+        "updates": total,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_updates_per_second": round(total / elapsed, 1),
+        "chat_turns_per_second": round(len(timings["handle_feedback"]) / elapsed, 1),
+        "handlers": {
+            name: {
+                "count": len(samples),
+                "p50_ms": round(percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(percentile(samples, 95) * 1000, 1),
+                "p99_ms": round(percentile(samples, 99) * 1000, 1),
+                "mean_ms": round(statistics.fmean(samples) * 1000, 1),
+            }
+            for name, samples in timings.items()
+        },
+        "event_loop_lag": {
+            "p50_ms": round(percentile(monitor.samples, 50) * 1000, 2),
+            "p99_ms": round(percentile(monitor.samples, 99) * 1000, 2),
+            "max_ms": round(max(monitor.samples, default=0.0) * 1000, 2),
+        },
+        "fakes": {
+            "llm_calls": fake_model.calls,
+            "llm_retries": bot_module.llm_pool.retries,
+            "updates_shed": {name: lane.shed for name, lane in bot_module.update_processor.lanes.items()},
+            "db_reads": fake_db.reads,
+            "db_writes": fake_db.writes,
+            "telegram_sends": fake_bot.sent,
+            "telegram_edits": fake_bot.edits,
+        },
+    }
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n=== LOAD TEST: {report['users']} users, {report['updates']} updates ===")
+    print(f"Elapsed: {report['elapsed_seconds']}s  "
+          f"Throughput: {report['throughput_updates_per_second']} updates/s  "
+          f"Chat turns: {report['chat_turns_per_second']}/s")
+    print(f"\n{'handler':<18}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, stats in report["handlers"].items():
+        print(f"{name:<18}{stats['count']:>8}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}")
+    lag = report["event_loop_lag"]
+    print(f"\nEvent loop lag: p50 {lag['p50_ms']}ms  p99 {lag['p99_ms']}ms  max {lag['max_ms']}ms")
+    print(f"Fakes: {report['fakes']}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline load test for Jeff Jr's handlers")
+    parser.add_argument("--users", type=int, default=1000, help="Simulated founders")
+    parser.add_argument("--turns", type=int, default=3, help="Chat turns per founder after onboarding")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of Gemini calls that fail with a 429")
+    parser.add_argument("--db-latency-ms", type=float, default=40)
+    parser.add_argument("--telegram-latency-ms", type=float, default=30)
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a user's messages")
+    parser.add_argument("--command-share", type=float, default=0.0,
+                        help="Fraction of chat turns replaced by /help or /review, to time the fast lane under load")
+    parser.add_argument("--distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--max-p99-ms", type=float, help="Fail if handle_feedback p99 exceeds this")
+    parser.add_argument("--max-loop-lag-ms", type=float, help="Fail if event-loop lag p99 exceeds this")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    random.seed(args.seed)
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    failures = []
+    feedback_p99 = report["handlers"].get("handle_feedback", {}).get("p99_ms", 0)
+    if args.max_p99_ms is not None and feedback_p99 > args.max_p99_ms:
+        failures.append(f"handle_feedback p99 {feedback_p99}ms > {args.max_p99_ms}ms")
+    if args.max_loop_lag_ms is not None and report["event_loop_lag"]["p99_ms"] > args.max_loop_lag_ms:
+        failures.append(f"event-loop lag p99 {report['event_loop_lag']['p99_ms']}ms > {args.max_loop_lag_ms}ms")
+    if failures:
+        print("\n❌ " + "\n❌ ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+memory_bench.py - Resident memory of the session cache per 10k users, compared with the old dict shape
+
+Each shape is filled in a fresh interpreter with the same synthetic
+founders (a project row and a full history of JSON-decoded conversation
+rows each, as they arrive from Supabase) and the growth in RSS is
+reported per 10k users. "dicts" is the cache as it was before turns became
+slotted records: a TTLCache of plain sessions whose history holds one
+role/content dict per turn. "slots" is session_cache.SessionCache, whose
+own size estimate (the number SESSION_CACHE_MAX_MB is checked against) is
+shown next to the measured growth.
+
+    python -m bench.memory_bench --users 10000 --turns 20 --message-chars 300
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+from collections import deque
+from typing import Any, Dict, List
+
+SHAPES = ["dicts", "slots"]
+
+WORDS = ["revenue", "users", "token", "launch", "runway", "pivot", "growth", "swap", "fees", "seed", "market", "churn"]
+
+
+def rss_bytes() -> int:
+    """Current resident set size, or the peak where /proc isn't available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def founder_payloads(user_id: int, turns: int, message_chars: int) -> Dict[str, str]:
+    """One founder's project and conversation rows, JSON-encoded as a PostgREST response body."""
+    rng = random.Random(user_id)
+    project = {
+        "id": user_id, "user_id": user_id, "username": f"founder{user_id}",
+        "project_name": f"Project {user_id}", "stage": rng.choice(["Idea", "Development", "Launched"]),
+        "revenue_goal": "$10K/month via swap fees", "created_at": "2026-01-01T00:00:00+00:00",
+    }
+    rows = []
+    for turn in range(turns):
+        words: List[str] = []
+        length = 0
+        while length < message_chars:
+            words.append(rng.choice(WORDS))
+            length += len(words[-1]) + 1
+        rows.append({
+            "id": user_id * 1000 + turn, "user_id": user_id, "project_id": user_id,
+            "role": "user" if turn % 2 == 0 else "assistant",
+            "message": " ".join(words)[:message_chars], "timestamp": "2026-01-01T00:00:00+00:00",
+        })
+    return {"project": json.dumps(project), "history": json.dumps(rows)}
+
+
+class _DictSession:
+    # The session shape the cache used before this benchmark's "slots" shape
+    def __init__(self, history_size: int) -> None:
+        self.project = None
+        self.history: deque = deque(maxlen=history_size)
+        self.history_loaded = False
+
+
+def fill(shape: str, users: int, turns: int, message_chars: int) -> Dict[str, Any]:
+    from cachetools import TTLCache
+
+    from session_cache import SessionCache
+
+    # Payloads are built one founder at a time, so only what the cache keeps stays allocated
+    payloads = (founder_payloads(10_000 + user, turns, message_chars) for user in range(users))
+    gc.collect()
+    before = rss_bytes()
+
+    report: Dict[str, Any] = {}
+    if shape == "dicts":
+        cache: TTLCache = TTLCache(maxsize=users, ttl=3600)
+        for payload in payloads:
+            project = json.loads(payload["project"])
+            session = _DictSession(turns)
+            session.project = project
+            session.history.extend(
+                {"role": row["role"], "content": row["message"]} for row in json.loads(payload["history"])
+            )
+            session.history_loaded = True
+            cache[project["user_id"]] = session
+    else:
+        cache = SessionCache(maxsize=users, history_size=turns)
+        for payload in payloads:
+            project = json.loads(payload["project"])
+            cache.set_project(project["user_id"], project)
+            cache.set_history(
+                project["user_id"],
+                [{"role": row["role"], "content": row["message"]} for row in json.loads(payload["history"])],
+            )
+        report["estimated_bytes"] = cache.nbytes
+
+    gc.collect()
+    report["rss_growth_bytes"] = rss_bytes() - before
+    report["sessions"] = len(cache)
+    return report
+
+
+def run_child(shape: str, args: argparse.Namespace) -> Dict[str, Any]:
+    command = [
+        sys.executable, "-m", "bench.memory_bench", "--child", shape,
+        "--users", str(args.users), "--turns", str(args.turns), "--message-chars", str(args.message_chars),
+    ]
+    result = subprocess.run(
+        command,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{shape} run failed:\n{result.stderr}")
+    return json.loads(result.stdout)
+
+
+def summarize(results: Dict[str, Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    per_10k = 10_000 / args.users
+    report: Dict[str, Any] = {"users": args.users, "turns": args.turns, "message_chars": args.message_chars}
+    for shape, result in results.items():
+        entry = {"rss_mb_per_10k_users": round(result["rss_growth_bytes"] * per_10k / 2**20, 1)}
+        if "estimated_bytes" in result:
+            entry["estimated_mb_per_10k_users"] = round(result["estimated_bytes"] * per_10k / 2**20, 1)
+        report[shape] = entry
+    dicts, slots = report["dicts"]["rss_mb_per_10k_users"], report["slots"]["rss_mb_per_10k_users"]
+    report["saved_percent"] = round((dicts - slots) / dicts * 100, 1) if dicts else 0.0
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n=== MEMORY: {report['users']} users x {report['turns']} turns of {report['message_chars']} chars ===")
+    print(f"{'shape':<8}{'RSS MB/10k':>12}{'estimate MB/10k':>17}")
+    for shape in SHAPES:
+        entry = report[shape]
+        print(f"{shape:<8}{entry['rss_mb_per_10k_users']:>12}{entry.get('estimated_mb_per_10k_users', '-'):>17}")
+    print(f"\nSlotted turns use {report['saved_percent']}% less memory than dict turns")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Session cache memory per 10k users")
+    parser.add_argument("--users", type=int, default=10000, help="Cached founders")
+    parser.add_argument("--turns", type=int, default=20, help="Cached turns per founder (SESSION_HISTORY_TURNS)")
+    parser.add_argument("--message-chars", type=int, default=300, help="Length of each cached message")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--child", choices=SHAPES, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.child:
+        print(json.dumps(fill(args.child, args.users, args.turns, args.message_chars)))
+        return
+
+    report = summarize({shape: run_child(shape, args) for shape in SHAPES}, args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
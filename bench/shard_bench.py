@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+shard_bench.py - Offline benchmark of sharding.py's front and worker processes
+
+Starts a ShardedFront whose workers run bot.py's real Application (routing,
+ConversationHandler, update processor) against local fakes for Telegram,
+Gemini and Supabase, feeds it raw webhook bodies for simulated founders and
+reports throughput per worker count. Every founder's updates are sent
+back to back, so they only succeed if each user's order is kept; the
+Telegram call totals should match across worker counts.
+
+    python -m bench.shard_bench --workers 1 2 4 --users 500 --turns 3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+# bot.py validates these at import time; nothing here talks to the real services
+for _name, _value in {
+    "TELEGRAM_TOKEN": "123456:offline-benchmark",
+    "GOOGLE_API_KEY": "offline-benchmark",
+    "SUPABASE_URL": "http://localhost",
+    "SUPABASE_KEY": "offline.benchmark.key",
+    "STATE_STORE_URL": "sqlite:///:memory:",
+    "MESSAGE_DEBOUNCE_SECONDS": "0",
+    "USER_MESSAGES_PER_MINUTE": "0",
+    "BENCH_LOG_LEVEL": "WARNING",
+    # Measure processing throughput, not Telegram's flood limits (every founder here sends at once)
+    "TELEGRAM_MAX_MESSAGES_PER_SECOND": "0",
+    "TELEGRAM_CHAT_MESSAGES_PER_SECOND": "0",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from sharding import ShardedFront, raw_update_key
+
+QUESTIONS = [
+    "What's a good revenue model for a Solana DEX?",
+    "How do I get my first 100 users?",
+    "Should I raise a pre-seed round now or keep bootstrapping?",
+]
+
+
+def prepare(bot_module: Any) -> Any:
+    """Worker hook (see ``sharding.worker_main``): swap in the fakes, return the fake Telegram."""
+    import logging
+
+    from bench.fakes import FakeDatabase, FakeModel, FakeRequest, Latency
+    from llm import Backend
+
+    logging.getLogger().setLevel(os.environ["BENCH_LOG_LEVEL"])
+    distribution = os.environ.get("BENCH_DISTRIBUTION", "fixed")
+    fake_db = FakeDatabase(Latency(float(os.environ.get("BENCH_DB_LATENCY_MS", "5")) / 1000, distribution))
+    bot_module.db = fake_db
+    if bot_module.summarizer is not None:
+        bot_module.summarizer.db = fake_db
+    fake_model = FakeModel(Latency(float(os.environ.get("BENCH_LLM_LATENCY_MS", "50")) / 1000, distribution))
+    bot_module.llm_pool.backends = [Backend(fake_model, name="fake")]
+    bot_module.llm_pool.fallbacks = []
+    return FakeRequest(Latency(float(os.environ.get("BENCH_TELEGRAM_LATENCY_MS", "5")) / 1000, distribution))
+
+
+def build_updates(users: int, turns: int) -> List[bytes]:
+    """Every founder's onboarding and chat turns, founders interleaved step by step."""
+    from bench.fakes import RawUpdateFactory
+
+    factory = RawUpdateFactory()
+    steps = [
+        lambda user_id: factory.text(user_id, "/start"),
+        lambda user_id: factory.text(user_id, f"Project {user_id}"),
+        lambda user_id: factory.callback(user_id, random.choice(["Idea", "Development", "Launched"])),
+        lambda user_id: factory.text(user_id, "$10K/month via swap fees"),
+    ] + [lambda user_id: factory.text(user_id, random.choice(QUESTIONS))] * turns
+    return [step(10_000 + user) for step in steps for user in range(users)]
+
+
+async def _collect(front: ShardedFront, count: int, timeout: float) -> List[Dict[str, Any]]:
+    return [await asyncio.to_thread(front.reports.get, True, timeout) for _ in range(count)]
+
+
+async def run_once(workers: int, updates: List[bytes], timeout: float) -> Dict[str, Any]:
+    front = ShardedFront(workers, queue_size=len(updates) + 1, prepare="bench.shard_bench:prepare", collect_reports=True)
+    front.start()
+    await _collect(front, workers, timeout)
+
+    started = time.perf_counter()
+    for raw in updates:
+        # The front's per-update work: parse the body, find the user, pick a shard
+        if not front.dispatch(raw, raw_update_key(json.loads(raw))):
+            raise RuntimeError("shard queue full")
+    dispatched = time.perf_counter()
+    stopping = asyncio.create_task(front.stop(timeout))
+    reports = await _collect(front, workers, timeout)
+    elapsed = time.perf_counter() - started
+    await stopping
+
+    telegram: Counter = Counter()
+    for report in reports:
+        telegram.update(report.get("telegram", {}))
+    telegram.pop("getMe", None)
+    return {
+        "workers": workers,
+        "updates": len(updates),
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_updates_per_second": round(len(updates) / elapsed, 1),
+        "front_us_per_update": round((dispatched - started) / len(updates) * 1e6, 1),
+        "per_shard_updates": [report["updates"] for report in sorted(reports, key=lambda report: report["shard"])],
+        "telegram_calls": dict(sorted(telegram.items())),
+    }
+
+
+def print_report(results: List[Dict[str, Any]]) -> None:
+    print(f"\n=== SHARDED: {results[0]['updates']} updates ===")
+    print(f"{'workers':>8}{'elapsed s':>11}{'updates/s':>11}{'front us':>10}  per shard")
+    for result in results:
+        print(f"{result['workers']:>8}{result['elapsed_seconds']:>11}{result['throughput_updates_per_second']:>11}"
+              f"{result['front_us_per_update']:>10}  {result['per_shard_updates']}")
+    for result in results:
+        print(f"Telegram calls with {result['workers']} worker(s): {result['telegram_calls']}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the sharded front and workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="Worker counts to compare")
+    parser.add_argument("--users", type=int, default=500, help="Simulated founders")
+    parser.add_argument("--turns", type=int, default=3, help="Chat turns per founder after onboarding")
+    parser.add_argument("--llm-latency-ms", type=float, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=5)
+    parser.add_argument("--telegram-latency-ms", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds to wait for workers")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    random.seed(args.seed)
+    # Spawned workers read their fakes' settings from the environment
+    os.environ["BENCH_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["BENCH_DB_LATENCY_MS"] = str(args.db_latency_ms)
+    os.environ["BENCH_TELEGRAM_LATENCY_MS"] = str(args.telegram_latency_ms)
+    updates = build_updates(args.users, args.turns)
+
+    results = [asyncio.run(run_once(workers, updates, args.timeout)) for workers in args.workers]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    if len({json.dumps(result["telegram_calls"], sort_keys=True) for result in results}) > 1:
+        print("\n❌ Telegram calls differ between worker counts; some updates were handled out of order or lost")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
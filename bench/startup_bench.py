@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+startup_bench.py - Cold-start benchmark: import time of bot.py and time until it takes updates
+
+Each run is a fresh interpreter that imports bot.py, builds the Application
+and runs its post_init hook against a fake Supabase, so nothing is cached
+between runs. Reports the median and worst of each phase, which heavy
+libraries were already loaded by the import, and how long the background
+work started at boot (table checks, Gemini SDK warm-up) took to finish.
+--max-ready-ms makes it exit non-zero on a regression.
+
+    python -m bench.startup_bench --runs 5 --db-latency-ms 500
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+# bot.py validates these at import time; nothing here talks to the real services
+for _name, _value in {
+    "TELEGRAM_TOKEN": "123456:offline-benchmark",
+    "GOOGLE_API_KEY": "offline-benchmark",
+    "SUPABASE_URL": "http://localhost",
+    "SUPABASE_KEY": "offline.benchmark.key",
+    "STATE_STORE_URL": "sqlite:///:memory:",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+# Libraries that dominate cold starts when imported eagerly
+HEAVY_MODULES = ["google.generativeai", "grpc", "supabase", "postgrest", "aiohttp"]
+
+PHASES = ["import_ms", "build_ms", "post_init_ms", "ready_ms"]
+
+
+def _ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+async def _boot(bot_module: Any, application: Any, db_latency: float, started: float, report: Dict[str, Any]) -> None:
+    from bench.fakes import FakeDatabase, Latency
+
+    fake_db = FakeDatabase(Latency(db_latency, "fixed"))
+    bot_module.db = fake_db
+    if bot_module.summarizer is not None:
+        bot_module.summarizer.db = fake_db
+
+    before = time.perf_counter()
+    await bot_module.on_startup(application)
+    ready = time.perf_counter()
+    report["post_init_ms"] = _ms(ready - before)
+    report["ready_ms"] = _ms(ready - started)
+
+    background = {}
+    pending = set(bot_module.startup_tasks)
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            background[task.get_name()] = _ms(time.perf_counter() - ready)
+    report["background_ms"] = background
+
+    await bot_module.conversation_writer.close()
+
+
+def measure_once(db_latency: float) -> Dict[str, Any]:
+    """One cold start in this interpreter; only meaningful in a fresh process."""
+    started = time.perf_counter()
+    import bot as bot_module
+
+    imported = time.perf_counter()
+    application = bot_module.build_application()
+    built = time.perf_counter()
+    report: Dict[str, Any] = {
+        "import_ms": _ms(imported - started),
+        "build_ms": _ms(built - imported),
+        "heavy_modules_at_import": [name for name in HEAVY_MODULES if name in sys.modules],
+    }
+    asyncio.run(_boot(bot_module, application, db_latency, started, report))
+    return report
+
+
+def run_child(args: argparse.Namespace) -> Dict[str, Any]:
+    command = [sys.executable, "-m", "bench.startup_bench", "--child", "--db-latency-ms", str(args.db_latency_ms)]
+    result = subprocess.run(
+        command,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"startup run failed:\n{result.stderr}")
+    return json.loads(result.stdout)
+
+
+def summarize(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"runs": len(runs)}
+    for phase in PHASES:
+        samples = [run[phase] for run in runs]
+        report[phase] = {"median": round(statistics.median(samples), 1), "max": max(samples)}
+    tasks = sorted({name for run in runs for name in run["background_ms"]})
+    report["background_ms"] = {
+        name: round(statistics.median(run["background_ms"][name] for run in runs), 1) for name in tasks
+    }
+    report["heavy_modules_at_import"] = runs[-1]["heavy_modules_at_import"]
+    return report
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n=== STARTUP: {report['runs']} cold starts ===")
+    print(f"{'phase':<16}{'median ms':>12}{'max ms':>10}")
+    for phase in PHASES:
+        print(f"{phase[:-3]:<16}{report[phase]['median']:>12}{report[phase]['max']:>10}")
+    print("\nBackground after ready (median ms): "
+          + ", ".join(f"{name} {ms}" for name, ms in report["background_ms"].items()))
+    print(f"Heavy modules loaded by import: {report['heavy_modules_at_import'] or 'none'}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for Jeff Jr")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to start")
+    parser.add_argument("--db-latency-ms", type=float, default=200, help="Latency of each fake table check")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--max-ready-ms", type=float, help="Fail if the median time to ready exceeds this")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if args.child:
+        print(json.dumps(measure_once(args.db_latency_ms / 1000)))
+        return
+
+    report = summarize([run_child(args) for _ in range(args.runs)])
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.max_ready_ms is not None and report["ready_ms"]["median"] > args.max_ready_ms:
+        print(f"\n❌ median time to ready {report['ready_ms']['median']}ms > {args.max_ready_ms}ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
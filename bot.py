@@ -1,12 +1,13 @@
+import asyncio
 import logging
 import os
 import json
-from datetime import datetime
-from typing import Dict, Any, Optional, List
+import secrets
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Tuple
 
-import google.generativeai as genai
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Message, Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -16,7 +17,22 @@ from telegram.ext import (
     filters,
     ContextTypes,
 )
-from supabase import create_client, Client
+from telegram.request import BaseRequest
+
+from coalescing import MessageCoalescer
+from conversation_log import ConversationWriter
+from db import Database
+from llm import LLMPool, LLMUnavailableError, create_backends
+import metrics
+from outbound import OutboundRateLimiter, reply_in_parts
+from persistence import StatePersistence, create_state_store
+from prompts import SYSTEM_PROMPT, build_contents
+from ratelimit import TokenBucket, UserRateLimiter
+from response_cache import ResponseCache
+from scheduling import Lane, LaneOverloaded, PerUserUpdateProcessor
+from session_cache import SessionCache, Turn
+from summarizer import ConversationSummarizer
+from telegram_stream import stream_reply
 
 # Load environment variables
 load_dotenv()
@@ -42,40 +58,209 @@ NAME, STAGE, REVENUE, FEEDBACK = range(4)
 # Project stages
 STAGES = ["Idea", "Development", "Launched"]
 
-# Configure Supabase
-supabase_url = os.environ.get("SUPABASE_URL")
-supabase_key = os.environ.get("SUPABASE_KEY")
-supabase: Client = create_client(supabase_url, supabase_key)
-
-# Configure Google AI
-google_api_key = os.environ.get("GOOGLE_API_KEY")
-genai.configure(api_key=google_api_key)
-model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash",
-    generation_config={
-        "temperature": 0.7,
-        "top_p": 0.9,
-        "top_k": 40,
-        "max_output_tokens": 150,
-    },
-    safety_settings=[
-        {
-            "category": "HARM_CATEGORY_HARASSMENT",
-            "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-        },
-        {
-            "category": "HARM_CATEGORY_HATE_SPEECH",
-            "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-        },
-        {
-            "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-            "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-        },
-        {
-            "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-            "threshold": "BLOCK_MEDIUM_AND_ABOVE",
-        },
-    ],
+# Async, pooled Supabase client, connected on first use so DB round trips don't block the event loop
+db = Database(
+    os.environ.get("SUPABASE_URL"),
+    os.environ.get("SUPABASE_KEY"),
+    pool_size=int(os.environ.get("DB_POOL_SIZE", "20")),
+    timeout=float(os.environ.get("DB_TIMEOUT_SECONDS", "10")),
+)
+
+async def insert_conversation_rows(rows: List[Dict[str, Any]]) -> None:
+    with metrics.span("db_write"):
+        await db.insert_conversations(rows)
+
+# Conversation rows are written behind the reply in batched inserts
+conversation_writer = ConversationWriter(
+    insert_conversation_rows,
+    batch_size=int(os.environ.get("CONVERSATION_BATCH_SIZE", "50")),
+    flush_interval=float(os.environ.get("CONVERSATION_FLUSH_SECONDS", "1.0")),
+    max_pending=int(os.environ.get("CONVERSATION_MAX_PENDING", "10000")),
+)
+
+# Active project and recent turns per user, so steady-state turns skip DB reads
+session_cache = SessionCache(
+    maxsize=int(os.environ.get("SESSION_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("SESSION_CACHE_TTL_SECONDS", "3600")),
+    history_size=int(os.environ.get("SESSION_HISTORY_TURNS", "20")),
+    # Estimated bytes of cached projects and turns; idle users are evicted past this (0 disables)
+    max_bytes=int(float(os.environ.get("SESSION_CACHE_MAX_MB", "256")) * 1024 * 1024),
+)
+
+# Cold sessions load project, history and summary with one chat_turn_context RPC (migrations/0003)
+CHAT_TURN_RPC = os.environ.get("CHAT_TURN_RPC", "true").lower() in ("1", "true", "yes")
+
+# Gemini backends: one per API key for the primary model, then a cheaper fallback model
+google_api_keys = list(dict.fromkeys(
+    [os.environ.get("GOOGLE_API_KEY")]
+    + [key.strip() for key in os.environ.get("GOOGLE_API_KEYS", "").split(",") if key.strip()]
+))
+LLM_MODEL = os.environ.get("LLM_MODEL", "gemini-2.0-flash")
+LLM_FALLBACK_MODEL = os.environ.get("LLM_FALLBACK_MODEL", "gemini-2.0-flash-lite")
+LLM_BREAKER_FAILURES = int(os.environ.get("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Bound concurrent Gemini calls so a burst of users can't pile up unbounded work
+llm_pool = LLMPool(
+    create_backends(LLM_MODEL, google_api_keys, SYSTEM_PROMPT, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS),
+    max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "8")),
+    timeout=float(os.environ.get("LLM_TIMEOUT_SECONDS", "30")),
+    use_threads=os.environ.get("LLM_USE_THREADS", "").lower() in ("1", "true", "yes"),
+    fallbacks=create_backends(
+        LLM_FALLBACK_MODEL, google_api_keys, SYSTEM_PROMPT, LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS
+    ) if LLM_FALLBACK_MODEL else (),
+    max_retries=int(os.environ.get("LLM_MAX_RETRIES", "3")),
+    # Keep total Gemini requests, across every key and retries, under the account quota
+    rate_limit=TokenBucket(float(os.environ["LLM_MAX_QPS"])) if float(os.environ.get("LLM_MAX_QPS", "0")) > 0 else None,
+)
+
+# Per-user message limit; overflow gets SLOW_DOWN_REPLY instead of a Gemini call
+USER_MESSAGES_PER_MINUTE = float(os.environ.get("USER_MESSAGES_PER_MINUTE", "20"))
+user_rate_limiter: Optional[UserRateLimiter] = None
+if USER_MESSAGES_PER_MINUTE > 0:
+    user_rate_limiter = UserRateLimiter(
+        per_minute=USER_MESSAGES_PER_MINUTE,
+        burst=int(os.environ.get("USER_MESSAGE_BURST", "5")),
+    )
+
+# Older turns are folded into a per-project summary every SUMMARY_EVERY_TURNS stored turns (0 disables)
+SUMMARY_EVERY_TURNS = int(os.environ.get("SUMMARY_EVERY_TURNS", "10"))
+summarizer: Optional[ConversationSummarizer] = None
+if SUMMARY_EVERY_TURNS > 0:
+    summarizer = ConversationSummarizer(
+        db,
+        llm_pool.generate,
+        every=SUMMARY_EVERY_TURNS,
+        keep_recent=int(os.environ.get("SUMMARY_KEEP_RECENT_TURNS", "10")),
+    )
+
+# Messages a user sends within this many seconds are answered as one turn (0 answers each at once)
+MESSAGE_DEBOUNCE_SECONDS = float(os.environ.get("MESSAGE_DEBOUNCE_SECONDS", "0.5"))
+
+# History is trimmed to this many estimated tokens before it is sent to Gemini
+PROMPT_HISTORY_TOKEN_BUDGET = int(os.environ.get("PROMPT_HISTORY_TOKEN_BUDGET", "1500"))
+
+# Opt-in cache of replies to near-identical questions from the same project at the same stage
+response_cache: Optional[ResponseCache] = None
+if os.environ.get("RESPONSE_CACHE_ENABLED", "").lower() in ("1", "true", "yes"):
+    response_cache = ResponseCache(
+        threshold=float(os.environ.get("RESPONSE_CACHE_THRESHOLD", "0.9")),
+        ttl=float(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", "86400")),
+        maxsize=int(os.environ.get("RESPONSE_CACHE_SIZE", "5000")),
+    )
+
+# Stream replies into Telegram as they are generated instead of waiting for the full answer
+STREAM_REPLIES = os.environ.get("STREAM_REPLIES", "").lower() in ("1", "true", "yes")
+STREAM_EDIT_INTERVAL = float(os.environ.get("STREAM_EDIT_INTERVAL_SECONDS", "1.0"))
+
+# Every Bot API call is paced under Telegram's flood limits, and RetryAfter is waited out and retried
+outbound_limiter = OutboundRateLimiter(
+    overall_rate=float(os.environ.get("TELEGRAM_MAX_MESSAGES_PER_SECOND", "30")),
+    chat_rate=float(os.environ.get("TELEGRAM_CHAT_MESSAGES_PER_SECOND", "1")),
+    group_rate=float(os.environ.get("TELEGRAM_GROUP_MESSAGES_PER_MINUTE", "20")) / 60,
+    chat_burst=int(os.environ.get("TELEGRAM_CHAT_BURST", "3")),
+)
+
+OVERLOADED_REPLY = "I'm swamped with founders right now. 🥵 Send that again in a minute."
+
+def update_lane(update: object) -> str:
+    """Commands and button presses never call Gemini; plain text may be a chat turn that does."""
+    if isinstance(update, Update):
+        if update.callback_query is not None:
+            return "fast"
+        message = update.effective_message
+        if message is not None and message.text and message.text.startswith("/"):
+            return "fast"
+    return "llm"
+
+async def reply_overloaded(update: object, lane: Lane) -> None:
+    if isinstance(update, Update) and update.effective_message is not None:
+        await update.effective_message.reply_text(OVERLOADED_REPLY)
+
+# Gemini-bound updates wait in a bounded lane and are shed once they've queued past the SLO (0 disables).
+# A few slots per Gemini slot keeps the queue here, where the SLO sees it, rather than in llm_pool.
+llm_lane = Lane(
+    "llm",
+    max_concurrent=int(os.environ.get("UPDATE_CONCURRENCY", str(4 * llm_pool.max_concurrency))),
+    max_queue=int(os.environ.get("LLM_LANE_MAX_QUEUE", "0")),
+    queue_slo=float(os.environ.get("LLM_LANE_QUEUE_SLO_SECONDS", "10")),
+)
+# /help, /review, /cancel, /start and button presses get their own slots, so they never queue behind chat turns
+fast_lane = Lane("fast", max_concurrent=int(os.environ.get("FAST_LANE_CONCURRENCY", "64")))
+
+# Different users' updates run concurrently, each user's strictly in order
+update_processor = PerUserUpdateProcessor(
+    max_pending=int(os.environ.get("MAX_PENDING_UPDATES", "4096")),
+    lanes=[llm_lane, fast_lane],
+    classify=update_lane,
+    on_shed=reply_overloaded,
+)
+
+# Onboarding states and user_data survive restarts
+persistence = StatePersistence(
+    create_state_store(os.environ.get("STATE_STORE_URL", "sqlite:///bot_state.sqlite3")),
+    update_interval=float(os.environ.get("STATE_UPDATE_INTERVAL_SECONDS", "5")),
+)
+
+# Update delivery: "polling" (default) or "webhook" for replicas behind a load balancer
+BOT_MODE = os.environ.get("BOT_MODE", "polling").lower()
+HTTP_PORT = int(os.environ["PORT"]) if os.environ.get("PORT") else None
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+
+# Export component stats on /metrics
+metrics.register_gauge("llm_in_flight", "Gemini requests in progress", lambda: llm_pool.in_flight)
+metrics.register_gauge("llm_waiting", "Gemini requests queued for a slot", lambda: llm_pool.waiting)
+metrics.register_gauge("updates_pending", "Updates accepted but not finished", lambda: update_processor.stats()["pending_updates"])
+metrics.register_gauge("updates_running", "Updates being handled", lambda: update_processor.running)
+metrics.register_gauge("update_longest_user_queue", "Longest per-user update queue", lambda: update_processor.stats()["longest_queue"])
+metrics.register_gauge(
+    "lane_waiting", "Updates waiting for a slot in each lane", label="lane",
+    read=lambda: {name: lane.waiting for name, lane in update_processor.lanes.items()},
+)
+metrics.register_gauge(
+    "lane_running", "Updates running in each lane", label="lane",
+    read=lambda: {name: lane.running for name, lane in update_processor.lanes.items()},
+)
+metrics.register_gauge(
+    "lane_shed_total", "Updates shed in each lane because it was full or past its queue-time SLO", label="lane", kind="counter",
+    read=lambda: {name: lane.shed for name, lane in update_processor.lanes.items()},
+)
+metrics.register_gauge(
+    "lane_completed_total", "Updates finished in each lane", label="lane", kind="counter",
+    read=lambda: {name: lane.completed for name, lane in update_processor.lanes.items()},
+)
+metrics.register_gauge("telegram_flood_waits_total", "Bot API calls Telegram answered with RetryAfter", lambda: outbound_limiter.flood_waits, kind="counter")
+metrics.register_gauge("telegram_throttled_seconds_total", "Time Bot API calls waited for the outbound rate limits", lambda: outbound_limiter.throttled_seconds, kind="counter")
+metrics.register_gauge("conversation_rows_pending", "Conversation rows not yet written", lambda: conversation_writer.stats()["pending"])
+metrics.register_gauge("conversation_write_retries_total", "Retried conversation flushes", lambda: conversation_writer.retries, kind="counter")
+metrics.register_gauge("conversation_write_failures_total", "Conversation flushes that gave up", lambda: conversation_writer.failed_flushes, kind="counter")
+metrics.register_gauge("conversation_rows_rejected_total", "Conversation rows the database rejected and that were dropped", lambda: conversation_writer.rows_rejected, kind="counter")
+metrics.register_gauge("conversation_rows_dropped_total", "Conversation rows dropped because too many were waiting", lambda: conversation_writer.rows_dropped, kind="counter")
+metrics.register_gauge("llm_timeouts_total", "Gemini requests that timed out", lambda: llm_pool.timeouts, kind="counter")
+metrics.register_gauge("llm_retries_total", "Gemini requests retried on another backend", lambda: llm_pool.retries, kind="counter")
+metrics.register_gauge("llm_fallback_requests_total", "Gemini requests sent to the fallback model", lambda: llm_pool.fallback_requests, kind="counter")
+metrics.register_gauge("llm_shed_total", "Gemini requests refused because every circuit was open", lambda: llm_pool.shed, kind="counter")
+metrics.register_gauge("llm_throttled_seconds_total", "Time Gemini requests waited for LLM_MAX_QPS", lambda: llm_pool.throttled_seconds, kind="counter")
+metrics.register_gauge("user_messages_rate_limited_total", "Messages refused by the per-user rate limit", lambda: user_rate_limiter.rejected if user_rate_limiter else 0, kind="counter")
+metrics.register_gauge("coalesced_messages_pending", "Messages waiting out the debounce window", lambda: message_coalescer.pending() if message_coalescer else 0)
+metrics.register_gauge("summary_folds_total", "Conversation summaries updated", lambda: summarizer.folds if summarizer else 0, kind="counter")
+metrics.register_gauge("summary_failures_total", "Conversation summary updates that failed", lambda: summarizer.failed_folds if summarizer else 0, kind="counter")
+metrics.register_gauge(
+    "llm_circuit_open", "1 while a Gemini backend's circuit is open", label="backend",
+    read=lambda: {name: int(state == "open") for name, state in llm_pool.stats()["circuits"].items()},
+)
+metrics.register_gauge("session_cache_sessions", "Users whose project and recent turns are in memory", lambda: len(session_cache))
+metrics.register_gauge("session_cache_bytes", "Estimated memory held by the session cache", lambda: session_cache.nbytes)
+metrics.register_gauge("session_cache_evictions_total", "Sessions evicted to stay within SESSION_CACHE_SIZE or SESSION_CACHE_MAX_MB", lambda: session_cache.evictions, kind="counter")
+metrics.register_gauge(
+    "cache_hits_total", "Cache hits", label="cache", kind="counter",
+    read=lambda: {"session": session_cache.hits, "response": response_cache.hits if response_cache else 0},
+)
+metrics.register_gauge(
+    "cache_misses_total", "Cache misses", label="cache", kind="counter",
+    read=lambda: {"session": session_cache.misses, "response": response_cache.misses if response_cache else 0},
 )
 
 # Check required environment variables
@@ -85,119 +270,190 @@ if missing_vars:
     logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
     exit(1)
 
-# Synchronous database checks
-def check_tables_exist():
-    try:
-        response = supabase.table("projects").select("id", count="exact").limit(1).execute()
-        logger.info("✅ Projects table exists")
-    except Exception as e:
-        logger.error(f"❌ Projects table does not exist: {e}")
-        return False
-
-    try:
-        response = supabase.table("conversations").select("id", count="exact").limit(1).execute()
-        logger.info("✅ Conversations table exists")
-    except Exception as e:
-        logger.error(f"❌ Conversations table does not exist: {e}")
-        return False
-
-    return True
-
-def init_database():
-    if not check_tables_exist():
+# Database checks, run in the background once the bot is already taking updates
+async def check_database() -> None:
+    global summarizer
+    projects_ok, conversations_ok, summaries_ok = await asyncio.gather(
+        db.table_exists("projects"),
+        db.table_exists("conversations"),
+        db.table_exists("project_summaries", column="project_id"),
+    )
+    if not (projects_ok and conversations_ok):
         logger.warning("Required database tables are missing. Please run setup_db.py or create tables manually.")
     else:
         logger.info("✅ Database tables exist")
+    if summarizer is not None and not summaries_ok:
+        logger.warning("Project summaries table is missing, so conversation summaries are off (run setup_db.py)")
+        summarizer = None
 
 # Asynchronous functions for database operations
 async def store_conversation(user_id: int, project_id: int, message: str, role: str) -> None:
-    try:
-        supabase.table("conversations").insert({
-            "user_id": user_id,
-            "project_id": project_id,
-            "message": message,
-            "role": role
-        }).execute()
-    except Exception as e:
-        logger.error(f"Error storing conversation: {e}")
+    # Stamp the row now: rows flushed in one batch would otherwise share a timestamp
+    conversation_writer.enqueue({
+        "user_id": user_id,
+        "project_id": project_id,
+        "message": message,
+        "role": role,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    })
+    session_cache.append_turn(user_id, role, message)
+    if summarizer is not None:
+        summarizer.note_turn(project_id, user_id)
 
 async def get_project_by_user_id(user_id: int) -> Optional[Dict[str, Any]]:
+    project = session_cache.get_project(user_id)
+    if project is not None:
+        metrics.note("session_cache_hits")
+        return project
     try:
-        response = supabase.table("projects").select("*").eq("user_id", user_id).order("created_at", desc=True).limit(1).execute()
-        if response.data and len(response.data) > 0:
-            return response.data[0]
-        return None
+        with metrics.span("db_read"):
+            project = await db.get_latest_project(user_id)
+        if project is not None:
+            session_cache.set_project(user_id, project)
+        return project
     except Exception as e:
+        metrics.inc("errors", stage="db_read")
         logger.error(f"Error getting project: {e}")
         return None
 
-async def get_conversation_history(user_id: int, limit: int = 10) -> List[Dict[str, str]]:
+def _row_key(row: Dict[str, Any]) -> Tuple[Any, str, str]:
+    # Postgres echoes the timestamp back in its own format (trailing zeros dropped), so compare instants
+    timestamp = row.get("timestamp")
+    try:
+        timestamp = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        pass
+    return timestamp, row["role"], row["message"]
+
+def cache_history(user_id: int, rows: List[Dict[str, Any]], limit: int) -> List[Turn]:
+    """Cache the user's stored rows (oldest first) as their history and return it."""
+    # Turns still waiting in the write-behind buffer are newer than anything stored, but the
+    # batch being written may already have landed, so skip pending rows the read returned too
+    pending = conversation_writer.pending_for(user_id)
+    if pending:
+        stored = {_row_key(row) for row in rows}
+        rows = (rows + [row for row in pending if _row_key(row) not in stored])[-limit:]
+    return session_cache.set_history(user_id, [{"role": row['role'], "content": row['message']} for row in rows])
+
+async def get_conversation_history(user_id: int, limit: Optional[int] = None) -> List[Dict[str, str]]:
+    # Default to every cached turn; the prompt builder trims by token budget
+    limit = limit or session_cache.history_size
+    cached = session_cache.get_history(user_id, limit)
+    if cached is not None:
+        metrics.note("session_cache_hits")
+        return cached
     try:
-        response = supabase.table("conversations").select("*").eq("user_id", user_id).order("timestamp", desc=True).limit(limit).execute()
-        conversation = []
-        if response.data:
-            for msg in reversed(response.data):
-                conversation.append({"role": msg['role'], "content": msg['message']})
-        return conversation
+        fetch_limit = max(limit, session_cache.history_size)
+        with metrics.span("db_read"):
+            rows = await db.get_recent_conversations(user_id, fetch_limit)
+        return cache_history(user_id, rows, fetch_limit)[-limit:]
     except Exception as e:
+        metrics.inc("errors", stage="db_read")
         logger.error(f"Error getting conversation history: {e}")
         return []
 
+async def get_project_summary(project_id: int) -> Optional[str]:
+    """The rolling summary of turns older than the cached history, if any."""
+    if summarizer is None:
+        return None
+    with metrics.span("db_read"):
+        return await summarizer.get(project_id)
+
+async def prefetch_turn_context(user_id: int) -> None:
+    """Warm a cold session with one chat_turn_context RPC instead of a read per part.
+
+    The getters above then hit the caches. A project already cached (say,
+    one just created by /start) is kept. If the function is missing the RPC
+    is turned off, and on any error the getters simply do their own reads.
+    """
+    global CHAT_TURN_RPC
+    if not CHAT_TURN_RPC or session_cache.is_warm(user_id):
+        return
+    try:
+        with metrics.span("db_read"):
+            context = await db.chat_turn_context(user_id, session_cache.history_size)
+    except Exception as e:
+        metrics.inc("errors", stage="db_read")
+        # PGRST202: PostgREST has no such function, i.e. migrations/0003 isn't applied
+        if getattr(e, "code", None) == "PGRST202":
+            logger.warning(f"chat_turn_context RPC unavailable, using per-table reads (run migrate.py up): {e}")
+            CHAT_TURN_RPC = False
+        else:
+            logger.error(f"Error prefetching turn context: {e}")
+        return
+    project = context.get("project")
+    if project is None:
+        return
+    cached = session_cache.peek_project(user_id)
+    if cached is None:
+        session_cache.set_project(user_id, project)
+    cache_history(user_id, context.get("history") or [], session_cache.history_size)
+    if summarizer is not None and (cached is None or cached["id"] == project["id"]):
+        summarizer.prime(project["id"], context.get("summary"))
+
+AI_ERROR_REPLY = "Sorry, I'm having trouble connecting to my brain right now. Try again in a moment. 🤔"
+
 async def get_ai_response(conversation_history: List[Dict[str, str]], 
                          user_message: str, 
-                         project_info: Optional[Dict[str, Any]] = None) -> str:
-    system_prompt = """
-    You are Jeff Jr, a no-nonsense venture capitalist Telegram bot with a focus on startups, particularly in the blockchain and DeFi space on Solana. Your personality is blunt, professional, and a bit sarcastic. You value directness and efficiency in communication.
-
-    Key Traits:
-    1. **Blunt and Professional:** Provide honest feedback without sugar-coating, but remain professional.
-    2. **Time-Conscious:** Keep responses concise and to the point.
-    3. **Startup Expert:** Strong knowledge in MVPs, revenue models, market fit, and funding.
-    4. **Critical Thinker:** Ask tough questions to help founders refine their ideas.
-    5. **Blockchain and DeFi Savvy:** Expertise in crypto/blockchain projects, especially on Solana.
-    6. **Calm and Collected with Sarcasm:** Maintain composure while being straightforward and occasionally sarcastic.
-
-    Response Guidelines:
-    - **Brevity:** Always limit responses to 2-3 sentences. If more detail is needed, ask the user if they want to know more.
-    - **Probing Questions:** Ask about business models, revenue plans, and market fit when relevant.
-    - **Constructive Criticism:** Challenge weak ideas firmly but constructively.
-    - **Emojis:** Use sparingly for emphasis (max 1 per message).
-    - **Actionable Advice:** Focus on practical steps the founder can take.
-    - **Tone:** Friendly yet blunt, like a knowledgeable friend who doesn't hold back.
-    - **Genuine Care:** Show interest in the project while being honest and direct.
-    - **Handling Off-Topic Questions:** If the user asks something unrelated to their project or startup advice, respond with something like: "Hey, let's stay focused on your project. If you have questions about [topic], maybe we can discuss that later, but right now, I want to help you with your startup."
-
-    Remember, your goal is to help founders build viable businesses by providing insightful, honest feedback and guidance. And if possible only give the ansewr in a single format as this is used for the telegram messages responses will not look good
-    """
-    
-    chat = [{"role": "system", "content": system_prompt}]
-    
-    if project_info:
-        project_context = f"""
-        Current project information:
-        - Name: {project_info.get('project_name', 'Unknown')}
-        - Stage: {project_info.get('stage', 'Unknown')}
-        - Revenue Goal: {project_info.get('revenue_goal', 'Unknown')}
-        
-        Tailor your feedback to this specific project stage and goals.
-        """
-        chat.append({"role": "system", "content": project_context})
-    
-    for message in conversation_history:
-        chat.append(message)
-    
-    chat.append({"role": "user", "content": user_message})
-    
+                         project_info: Optional[Dict[str, Any]] = None,
+                         summary: Optional[str] = None) -> str:
+    contents = build_contents(conversation_history, user_message, project_info, PROMPT_HISTORY_TOKEN_BUDGET, summary)
     try:
-        response = model.generate_content([msg["content"] for msg in chat])
-        return response.text
+        with metrics.span("llm"):
+            return await llm_pool.generate(contents)
+    except asyncio.TimeoutError:
+        metrics.inc("errors", stage="llm_timeout")
+        logger.error(f"AI response timed out; LLM pool stats: {llm_pool.stats()}")
+        return AI_ERROR_REPLY
+    except LLMUnavailableError as e:
+        # Every backend is circuit-broken; answer now rather than queue behind a dead provider
+        metrics.inc("errors", stage="llm_unavailable")
+        logger.warning(f"AI response skipped: {e}")
+        return AI_ERROR_REPLY
     except Exception as e:
+        metrics.inc("errors", stage="llm")
         logger.error(f"Error generating AI response: {e}")
-        return "Sorry, I'm having trouble connecting to my brain right now. Try again in a moment. 🤔"
+        return AI_ERROR_REPLY
+
+async def reply_with_ai(message: Message,
+                        conversation_history: List[Dict[str, str]],
+                        user_message: str,
+                        project_info: Optional[Dict[str, Any]] = None,
+                        use_cache: bool = True,
+                        summary: Optional[str] = None) -> str:
+    """Answer ``message`` with Jeff Jr's reply and return the text that was sent."""
+    # Replies quote the founder's project, so they are only reused within that project
+    project = project_info or {}
+    cache_scope = f"{project.get('id', '')}:{project.get('stage', '')}"
+    use_cache = use_cache and response_cache is not None and response_cache.cacheable(user_message)
+    if use_cache:
+        cached = response_cache.get(user_message, cache_scope)
+        if cached is not None:
+            metrics.note("response_cache_hits")
+            with metrics.span("telegram_send"):
+                await reply_in_parts(message, cached)
+            return cached
+
+    if STREAM_REPLIES:
+        contents = build_contents(conversation_history, user_message, project_info, PROMPT_HISTORY_TOKEN_BUDGET, summary)
+        # Generation and the progressive edits interleave, so both count as llm time here
+        with metrics.span("llm"):
+            ai_response, complete = await stream_reply(message, llm_pool.stream(contents), AI_ERROR_REPLY, edit_interval=STREAM_EDIT_INTERVAL)
+    else:
+        ai_response = await get_ai_response(conversation_history, user_message, project_info, summary)
+        complete = ai_response != AI_ERROR_REPLY
+        with metrics.span("telegram_send"):
+            await reply_in_parts(message, ai_response)
+
+    # Error replies and streams that broke off midway are never reused
+    if use_cache and complete:
+        response_cache.put(user_message, cache_scope, ai_response)
+    return ai_response
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.effective_user
     logger.info(f"User {user.id} ({user.username}) started the bot")
+    session_cache.invalidate(user.id)
     await update.message.reply_text(
         f"Welcome to Jeff Jr, your AI VC coach! 😎\nWhat's your project name? Be clear!"
     )
@@ -236,63 +492,118 @@ async def revenue_goal(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
     user = update.effective_user
     context.user_data["revenue_goal"] = text
     logger.info(f"User {user.id} entered revenue goal: {text}")
-    try:
-        project_data = {
-            "user_id": user.id,
-            "username": user.username,
-            "project_name": context.user_data["project_name"],
-            "stage": context.user_data["stage"],
-            "revenue_goal": text
-        }
-        response = supabase.table("projects").insert(project_data).execute()
-        project = response.data[0]
-        context.user_data["project_id"] = project['id']
-        await store_conversation(
-            user_id=user.id,
-            project_id=project['id'],
-            message=f"My project is {project['project_name']} (Stage: {project['stage']}) with revenue goal: {project['revenue_goal']}",
-            role="user"
-        )
-        ai_prompt = "The user has just provided their project details. Please provide an initial assessment and ask 2-3 relevant questions based on the project stage."
-        ai_response = await get_ai_response([], ai_prompt, project)
+    async with metrics.turn("revenue_goal", user.id):
+        try:
+            project_data = {
+                "user_id": user.id,
+                "username": user.username,
+                "project_name": context.user_data["project_name"],
+                "stage": context.user_data["stage"],
+                "revenue_goal": text
+            }
+            with metrics.span("db_write"):
+                project = await db.insert_project(project_data)
+            session_cache.set_project(user.id, project)
+            # The saved project carries the onboarding answers, so keep only it in user_data
+            for key in ("project_name", "stage", "revenue_goal", "project_id"):
+                context.user_data.pop(key, None)
+            context.user_data["project"] = project
+            await store_conversation(
+                user_id=user.id,
+                project_id=project['id'],
+                message=f"My project is {project['project_name']} (Stage: {project['stage']}) with revenue goal: {project['revenue_goal']}",
+                role="user"
+            )
+            ai_prompt = "The user has just provided their project details. Please provide an initial assessment and ask 2-3 relevant questions based on the project stage."
+            # The onboarding prompt is identical for every project, so never serve it from the cache
+            ai_response = await reply_with_ai(update.message, [], ai_prompt, project, use_cache=False)
+            await store_conversation(
+                user_id=user.id,
+                project_id=project['id'],
+                message=ai_response,
+                role="assistant"
+            )
+        except Exception as e:
+            metrics.inc("errors", stage="revenue_goal")
+            logger.error(f"Error saving project: {e}")
+            await update.message.reply_text(
+                "There was an error saving your project. Please try again with /start."
+            )
+    return FEEDBACK
+
+SLOW_DOWN_REPLY = "Whoa, slow down. 🐢 Give me a second to catch up with what you've already sent."
+
+async def answer_messages(user_id: int, project: Dict[str, Any], messages: List[Message],
+                          conversation_history: Optional[List[Dict[str, str]]] = None) -> None:
+    """Answer one or more user messages with a single AI turn, replying to the last."""
+    async with metrics.turn("handle_feedback", user_id):
+        if len(messages) > 1:
+            metrics.note("coalesced_messages", len(messages))
+        if conversation_history is None:
+            conversation_history, summary = await asyncio.gather(
+                get_conversation_history(user_id),
+                get_project_summary(project['id']),
+            )
+        else:
+            summary = await get_project_summary(project['id'])
+        for message in messages:
+            await store_conversation(
+                user_id=user_id,
+                project_id=project['id'],
+                message=message.text,
+                role="user"
+            )
+        text = "\n".join(message.text for message in messages)
+        ai_response = await reply_with_ai(messages[-1], conversation_history, text, project, summary=summary)
         await store_conversation(
-            user_id=user.id,
+            user_id=user_id,
             project_id=project['id'],
             message=ai_response,
             role="assistant"
         )
-        await update.message.reply_text(ai_response)
-    except Exception as e:
-        logger.error(f"Error saving project: {e}")
-        await update.message.reply_text(
-            "There was an error saving your project. Please try again with /start."
-        )
-    return FEEDBACK
+
+async def answer_burst(user_id: int, messages: List[Message]) -> None:
+    # Coalesced turns run outside the update processor, so they take an llm lane slot here
+    try:
+        async with llm_lane.slot():
+            project = await get_project_by_user_id(user_id)
+            if project:
+                await answer_messages(user_id, project, messages)
+    except LaneOverloaded:
+        await messages[-1].reply_text(OVERLOADED_REPLY)
+
+message_coalescer: Optional[MessageCoalescer] = None
+if MESSAGE_DEBOUNCE_SECONDS > 0:
+    message_coalescer = MessageCoalescer(answer_burst, window=MESSAGE_DEBOUNCE_SECONDS)
 
 async def handle_feedback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     user = update.effective_user
-    text = update.message.text
-    project = await get_project_by_user_id(user.id)
+    if user_rate_limiter is not None and not user_rate_limiter.allow(user.id):
+        if user_rate_limiter.should_notify(user.id):
+            await update.message.reply_text(SLOW_DOWN_REPLY)
+        return FEEDBACK
+    # After a restart the persisted user_data still knows the project, so don't re-query it
+    if "project" in context.user_data and session_cache.get_project(user.id) is None:
+        session_cache.set_project(user.id, context.user_data["project"])
+    await prefetch_turn_context(user.id)
+    if message_coalescer is not None:
+        project = await get_project_by_user_id(user.id)
+        conversation_history = None
+    else:
+        project, conversation_history = await asyncio.gather(
+            get_project_by_user_id(user.id),
+            get_conversation_history(user.id),
+        )
     if not project:
         await update.message.reply_text(
             "I can't find your project data. Please start over with /start."
         )
         return ConversationHandler.END
-    conversation_history = await get_conversation_history(user.id)
-    await store_conversation(
-        user_id=user.id,
-        project_id=project['id'],
-        message=text,
-        role="user"
-    )
-    ai_response = await get_ai_response(conversation_history, text, project)
-    await store_conversation(
-        user_id=user.id,
-        project_id=project['id'],
-        message=ai_response,
-        role="assistant"
-    )
-    await update.message.reply_text(ai_response)
+    if message_coalescer is not None:
+        # Answered in the background once the user pauses, together with anything else they send
+        message_coalescer.submit(user.id, update.message)
+    else:
+        await answer_messages(user.id, project, [update.message], conversation_history)
     return FEEDBACK
 
 async def review(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -336,9 +647,53 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE) -> N
             text="An error occurred. Please try again or use /start to restart."
         )
 
-def main() -> None:
-    """Start the bot."""
-    application = Application.builder().token(os.environ["TELEGRAM_TOKEN"]).build()
+web_runner = None
+startup_tasks: List[asyncio.Task] = []
+
+async def on_startup(application: Application) -> None:
+    global web_runner
+    await conversation_writer.start()
+    # Webhook mode runs its own server; when polling, still answer platform health checks
+    if BOT_MODE == "polling" and HTTP_PORT:
+        from webhook import start_web_server
+
+        web_runner = await start_web_server(application, HTTP_PORT)
+    # Neither blocks startup: handlers work before either finishes
+    startup_tasks.append(asyncio.create_task(check_database(), name="check-database"))
+    startup_tasks.append(asyncio.create_task(llm_pool.warm_up(), name="llm-warm-up"))
+
+async def on_shutdown(application: Application) -> None:
+    for task in startup_tasks:
+        task.cancel()
+    await asyncio.gather(*startup_tasks, return_exceptions=True)
+    if web_runner is not None:
+        await web_runner.cleanup()
+    if message_coalescer is not None:
+        await message_coalescer.close()
+    if summarizer is not None:
+        await summarizer.close()
+    await conversation_writer.close()
+    await db.close()
+    llm_pool.shutdown()
+
+def build_application(request: Optional[BaseRequest] = None) -> Application:
+    """Create the Application with every handler registered; nothing connects yet.
+
+    ``request`` replaces the HTTP layer used to reach Telegram (offline benchmarks pass a fake).
+    """
+    builder = Application.builder()
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    application = (
+        builder
+        .token(os.environ["TELEGRAM_TOKEN"])
+        .concurrent_updates(update_processor)
+        .rate_limiter(outbound_limiter)
+        .persistence(persistence)
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     
     application.add_error_handler(error_handler)
     
@@ -351,17 +706,40 @@ def main() -> None:
             FEEDBACK: [MessageHandler(filters.TEXT & ~filters.COMMAND, handle_feedback)],
         },
         fallbacks=[CommandHandler("cancel", cancel)],
+        name="onboarding",
+        persistent=True,
     )
     
     application.add_handler(conv_handler)
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("review", review))
-    
-    # Initialize the database during startup (synchronously)
-    init_database()
-    
+    return application
+
+def main() -> None:
+    """Start the bot."""
+    application = build_application()
+
     # Start the Bot
-    application.run_polling()
+    if BOT_MODE == "webhook":
+        from webhook import run_webhook
+
+        if not WEBHOOK_URL:
+            logger.error("BOT_MODE=webhook requires WEBHOOK_URL (the public HTTPS base URL of this service).")
+            exit(1)
+        secret_token = WEBHOOK_SECRET
+        if not secret_token:
+            # Fine for a single instance; replicas must share one WEBHOOK_SECRET
+            secret_token = secrets.token_urlsafe(32)
+            logger.warning("WEBHOOK_SECRET is not set; generated a random one for this process.")
+        asyncio.run(run_webhook(
+            application,
+            webhook_url=WEBHOOK_URL,
+            port=HTTP_PORT or 8080,
+            secret_token=secret_token,
+            webhook_path=WEBHOOK_PATH,
+        ))
+    else:
+        application.run_polling()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
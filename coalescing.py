@@ -0,0 +1,68 @@
+"""
+coalescing.py - Merges a user's rapid-fire messages into a single chat turn
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+class MessageCoalescer:
+    """Buffers each user's messages and hands them to ``flush`` in batches.
+
+    A user's first message starts a ``window``-second timer; everything that
+    arrives before it fires, or while that user's previous batch is still
+    being answered, goes into the same batch. Batches for one user are
+    flushed strictly in order.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[int, List[Any]], Awaitable[None]],
+        window: float = 0.5,
+    ) -> None:
+        self.flush = flush
+        self.window = window
+        self._buffers: Dict[int, List[Any]] = {}
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.messages = 0
+
+    def submit(self, user_id: int, item: Any) -> None:
+        buffer = self._buffers.get(user_id)
+        if buffer is not None:
+            buffer.append(item)
+            return
+        self._buffers[user_id] = [item]
+        task = asyncio.create_task(self._run(user_id), name=f"coalesce-{user_id}")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, user_id: int) -> None:
+        await asyncio.sleep(self.window)
+        lock = self._locks.get(user_id)
+        if lock is None:
+            lock = self._locks[user_id] = asyncio.Lock()
+        async with lock:
+            # Taken under the lock, so messages sent during the previous turn join this batch
+            items = self._buffers.pop(user_id)
+            self.batches += 1
+            self.messages += len(items)
+            try:
+                await self.flush(user_id, items)
+            except Exception as e:
+                logger.error(f"Failed to answer {len(items)} message(s) from user {user_id}: {e}")
+        if not lock.locked() and user_id not in self._buffers:
+            self._locks.pop(user_id, None)
+
+    def pending(self) -> int:
+        """Messages buffered but not yet being answered."""
+        return sum(len(items) for items in self._buffers.values())
+
+    async def close(self) -> None:
+        """Wait for every buffered message to be answered."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
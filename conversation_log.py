@@ -0,0 +1,198 @@
+"""
+conversation_log.py - Write-behind buffer that batches conversation inserts off the reply path
+"""
+
+import asyncio
+import logging
+import itertools
+import random
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+InsertRows = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+# SQLSTATE classes and PostgREST codes that fail the same way however often they are retried:
+# 22 bad data, 23 constraint violations, 42 unknown columns or missing privileges, PGRST1xx/2xx bad requests
+PERMANENT_ERROR_CODES = ("22", "23", "42", "PGRST1", "PGRST2")
+
+
+def is_permanent_error(e: Exception) -> bool:
+    """True if the database rejected the rows themselves, rather than being unreachable or overloaded."""
+    code = getattr(e, "code", None)
+    return isinstance(code, str) and code.startswith(PERMANENT_ERROR_CODES)
+
+
+class ConversationWriter:
+    """Queues conversation rows in memory and flushes them as bulk inserts.
+
+    A flush happens when ``batch_size`` rows are pending or ``flush_interval``
+    seconds have passed, whichever comes first. Failed flushes are retried
+    with jittered exponential backoff and the rows stay queued until they
+    are written, so a Supabase blip delays persistence instead of losing it.
+
+    A batch the database rejects outright (see ``is_permanent_error``) is
+    split in halves until the offending rows are found; those are logged
+    and dropped so they cannot block the rows behind them. At most
+    ``max_pending`` rows are held while the database is down; past that the
+    oldest are dropped.
+    """
+
+    def __init__(
+        self,
+        insert_rows: InsertRows,
+        batch_size: int = 50,
+        flush_interval: float = 1.0,
+        max_retries: int = 5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        max_pending: int = 10000,
+    ) -> None:
+        self.insert_rows = insert_rows
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_pending = max_pending
+        self._pending: Deque[Dict[str, Any]] = deque()
+        # The batch being written; still counted as pending until it lands
+        self._in_flight: List[Dict[str, Any]] = []
+        self._overflowing = False
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+        self.rows_written = 0
+        self.flushes = 0
+        self.retries = 0
+        self.failed_flushes = 0
+        self.rows_rejected = 0
+        self.rows_dropped = 0
+
+    def enqueue(self, row: Dict[str, Any]) -> None:
+        """Queue a row for the next flush. Never blocks."""
+        self._pending.append(row)
+        self._trim()
+        if len(self._pending) >= self.batch_size:
+            self._batch_ready.set()
+
+    def _trim(self) -> None:
+        """Drop the oldest queued rows beyond ``max_pending``."""
+        excess = len(self._pending) - self.max_pending
+        if excess <= 0:
+            return
+        for _ in range(excess):
+            self._pending.popleft()
+        self.rows_dropped += excess
+        if not self._overflowing:
+            self._overflowing = True
+            logger.error(
+                f"More than {self.max_pending} conversation rows are waiting to be written; "
+                f"dropping the oldest until the database catches up"
+            )
+
+    def pending_for(self, user_id: int) -> List[Dict[str, Any]]:
+        """Rows for ``user_id`` that have been queued but not yet written, oldest first."""
+        return [row for row in itertools.chain(self._in_flight, self._pending) if row["user_id"] == user_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending": len(self._in_flight) + len(self._pending),
+            "rows_written": self.rows_written,
+            "flushes": self.flushes,
+            "retries": self.retries,
+            "failed_flushes": self.failed_flushes,
+            "rows_rejected": self.rows_rejected,
+            "rows_dropped": self.rows_dropped,
+        }
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="conversation-writer")
+
+    async def close(self) -> None:
+        """Stop the background loop and flush everything still queued."""
+        self._closing = True
+        if self._task is not None:
+            self._batch_ready.set()
+            await self._task
+            self._task = None
+        while self._pending:
+            if not await self._flush_batch():
+                logger.error(
+                    f"Dropping {len(self._pending)} conversation rows that could not be written on shutdown"
+                )
+                self._pending.clear()
+
+    async def _run(self) -> None:
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            while self._pending and not self._closing:
+                if not await self._flush_batch():
+                    break
+                if len(self._pending) < self.batch_size:
+                    break
+
+    async def _flush_batch(self) -> bool:
+        """Write up to ``batch_size`` queued rows; return False if some could not be written yet."""
+        batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+        self._in_flight = batch
+        unwritten = batch
+        try:
+            unwritten = await self._write(batch)
+        finally:
+            self._in_flight = []
+            # Rows that still need writing go back to the front, in their original order
+            self._pending.extendleft(reversed(unwritten))
+            self._trim()
+        if not unwritten:
+            self._overflowing = False
+        return not unwritten
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Insert ``batch``, dropping rows the database rejects; return the rows left unwritten."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self.insert_rows(batch)
+                break
+            except Exception as e:
+                if is_permanent_error(e):
+                    return await self._isolate(batch, e)
+                if attempt == self.max_retries:
+                    self.failed_flushes += 1
+                    logger.error(
+                        f"Failed to write {len(batch)} conversation rows after "
+                        f"{attempt + 1} attempts, keeping them queued: {e}"
+                    )
+                    return batch
+                self.retries += 1
+                delay = min(self.max_backoff, self.base_backoff * 2 ** attempt)
+                delay *= random.uniform(0.5, 1.0)
+                logger.warning(f"Conversation flush failed ({e}); retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        self.rows_written += len(batch)
+        self.flushes += 1
+        return []
+
+    async def _isolate(self, batch: List[Dict[str, Any]], error: Exception) -> List[Dict[str, Any]]:
+        """Find the rows in a rejected batch by writing it in halves; the rejected ones are dropped."""
+        if len(batch) == 1:
+            row = batch[0]
+            self.rows_rejected += 1
+            logger.error(
+                f"Dropping a conversation row the database rejected "
+                f"(user {row.get('user_id')}, {row.get('role')}): {error}"
+            )
+            return []
+        middle = len(batch) // 2
+        unwritten = await self._write(batch[:middle])
+        if unwritten:
+            return unwritten + batch[middle:]
+        return await self._write(batch[middle:])
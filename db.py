@@ -0,0 +1,191 @@
+"""
+db.py - Async, pooled Supabase data access for the bot's handlers
+"""
+
+import functools
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def _pooled_client_class() -> type:
+    """The pooled PostgREST client class; postgrest (and pydantic) load on first use, not at import."""
+    from postgrest import AsyncPostgrestClient
+
+    class _PooledPostgrestClient(AsyncPostgrestClient):
+        """PostgREST client whose HTTP/2 session keeps a bounded pool of warm connections."""
+
+        def __init__(self, *args: Any, limits: httpx.Limits, **kwargs: Any) -> None:
+            self._limits = limits
+            super().__init__(*args, **kwargs)
+
+        def create_session(
+            self,
+            base_url: str,
+            headers: Dict[str, str],
+            timeout: Union[int, float, httpx.Timeout],
+            verify: bool = True,
+            proxy: Optional[str] = None,
+        ) -> httpx.AsyncClient:
+            return httpx.AsyncClient(
+                base_url=base_url,
+                headers=headers,
+                timeout=timeout,
+                verify=verify,
+                proxy=proxy,
+                follow_redirects=True,
+                http2=True,
+                limits=self._limits,
+            )
+
+    return _PooledPostgrestClient
+
+
+class Database:
+    """Awaitable versions of the queries the bot runs against Supabase.
+
+    Every method raises on failure; callers decide how to degrade.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        pool_size: int = 20,
+        keepalive_seconds: float = 60.0,
+        timeout: float = 10.0,
+    ) -> None:
+        self.url = url
+        self.key = key
+        self.pool_size = pool_size
+        self.keepalive_seconds = keepalive_seconds
+        self.timeout = timeout
+        self._client: Optional[Any] = None
+
+    @property
+    def client(self) -> Any:
+        """The shared PostgREST client, created on first use."""
+        if self._client is None:
+            self._client = _pooled_client_class()(
+                f"{self.url}/rest/v1",
+                headers={"apiKey": self.key, "Authorization": f"Bearer {self.key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=self.keepalive_seconds,
+                ),
+            )
+        return self._client
+
+    async def table_exists(self, table: str, column: str = "id") -> bool:
+        """Return True if ``table`` can be queried.
+
+        Reads at most one row; an exact count would scan the whole table.
+        """
+        try:
+            await self.client.table(table).select(column).limit(1).execute()
+            return True
+        except Exception as e:
+            logger.error(f"Table {table} is not queryable: {e}")
+            return False
+
+    async def get_latest_project(self, user_id: int) -> Optional[Dict[str, Any]]:
+        response = await (
+            self.client.table("projects")
+            .select("*")
+            .eq("user_id", user_id)
+            .order("created_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    async def get_recent_conversations(self, user_id: int, limit: int) -> List[Dict[str, Any]]:
+        """Return the user's last ``limit`` conversation rows, oldest first."""
+        response = await (
+            self.client.table("conversations")
+            .select("*")
+            .eq("user_id", user_id)
+            .order("timestamp", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        return list(reversed(response.data or []))
+
+    async def chat_turn_context(self, user_id: int, history_limit: int) -> Dict[str, Any]:
+        """Latest project, last ``history_limit`` rows (oldest first) and summary, in one round trip.
+
+        Calls the ``chat_turn_context`` function from migrations/0003; any of
+        the parts may be missing (``None``, or an empty history).
+        """
+        response = await self.client.rpc(
+            "chat_turn_context", {"p_user_id": user_id, "p_history_limit": history_limit}
+        ).execute()
+        return response.data or {}
+
+    async def insert_project(self, project: Dict[str, Any]) -> Dict[str, Any]:
+        response = await self.client.table("projects").insert(project).execute()
+        return response.data[0]
+
+    async def insert_conversations(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert one or more conversation rows in a single request."""
+        await self.client.table("conversations").insert(rows).execute()
+
+    async def get_conversations_after(
+        self, project_id: int, after: Optional[str], limit: int
+    ) -> List[Dict[str, Any]]:
+        """Return up to ``limit`` of the project's rows stamped after ``after``, oldest first."""
+        query = self.client.table("conversations").select("*").eq("project_id", project_id)
+        if after is not None:
+            query = query.gt("timestamp", after)
+        response = await query.order("timestamp").limit(limit).execute()
+        return response.data or []
+
+    async def get_project_summary(self, project_id: int) -> Optional[Dict[str, Any]]:
+        response = await (
+            self.client.table("project_summaries")
+            .select("*")
+            .eq("project_id", project_id)
+            .limit(1)
+            .execute()
+        )
+        return response.data[0] if response.data else None
+
+    async def upsert_project_summary(self, summary: Dict[str, Any]) -> None:
+        await self.client.table("project_summaries").upsert(summary, on_conflict="project_id").execute()
+
+    async def iter_rows(
+        self, table: str, after_id: int = 0, page_size: int = 1000, columns: str = "*"
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Yield pages of ``table`` in ``id`` order, resuming each page after the last id seen.
+
+        Keyset pagination keeps every page an index range scan on the primary
+        key, however deep into the table it is, unlike OFFSET.
+        """
+        while True:
+            response = await (
+                self.client.table(table)
+                .select(columns)
+                .gt("id", after_id)
+                .order("id")
+                .limit(page_size)
+                .execute()
+            )
+            rows = response.data or []
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            after_id = rows[-1]["id"]
+
+    async def close(self) -> None:
+        """Close pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
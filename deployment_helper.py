@@ -1,96 +1,119 @@
 #!/usr/bin/env python3
 """
 deployment_helper.py - A utility script to help with deployment to Railway or Render
+
+The readiness checks run concurrently, each with its own timeout, and
+passing results are cached for --cache-ttl seconds (keyed by a hash of the
+settings each check depends on), so repeated pre-deploy or health-hook
+runs are near-instant. --json prints a machine-readable report; the exit
+code is non-zero if any check failed.
 """
 
 import os
+import re
+import sys
 import json
-import subprocess
+import time
+import asyncio
+import hashlib
 import argparse
+from importlib import metadata
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-def check_environment():
+REQUIRED_VARS = ["TELEGRAM_TOKEN", "GOOGLE_API_KEY", "SUPABASE_URL", "SUPABASE_KEY"]
+CACHE_FILE = ".deploy_check_cache.json"
+GEMINI_API_URL = "https://generativelanguage.googleapis.com/v1beta/models"
+
+CheckResult = Tuple[bool, str]
+
+async def check_environment() -> CheckResult:
     """Check if all required environment variables are set"""
-    required_vars = ["TELEGRAM_TOKEN", "GOOGLE_API_KEY", "SUPABASE_URL", "SUPABASE_KEY"]
-    missing_vars = []
-    
-    for var in required_vars:
-        if not os.environ.get(var):
-            missing_vars.append(var)
-    
+    missing_vars = [var for var in REQUIRED_VARS if not os.environ.get(var)]
     if missing_vars:
-        print("❌ Missing required environment variables:")
-        for var in missing_vars:
-            print(f"  - {var}")
-        return False
-    
-    print("✅ All required environment variables are set")
-    return True
-
-def test_database_connection():
+        return False, f"Missing required environment variables: {', '.join(missing_vars)}"
+    return True, "All required environment variables are set"
+
+def _normalize(name: str) -> str:
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+def _installed_packages() -> Dict[str, str]:
+    return {
+        _normalize(dist.metadata["Name"]): dist.version
+        for dist in metadata.distributions()
+        if dist.metadata["Name"]
+    }
+
+async def check_dependencies() -> CheckResult:
+    """Check if all required packages are installed, from installed package metadata"""
+    # Reading every package's metadata takes a few hundred ms, so keep it off the event loop
+    installed = await asyncio.to_thread(_installed_packages)
+    with open("requirements.txt", "r") as f:
+        lines = [line.split("#")[0].strip() for line in f]
+
+    missing = []
+    mismatched = []
+    for line in lines:
+        match = re.match(r"^([A-Za-z0-9][A-Za-z0-9._-]*)(?:\[[^\]]*\])?\s*(?:==\s*([^\s;,]+))?", line)
+        if not match:
+            continue
+        name, pinned = _normalize(match.group(1)), match.group(2)
+        if name not in installed:
+            missing.append(match.group(1))
+        elif pinned and installed[name] != pinned:
+            mismatched.append(f"{match.group(1)} {installed[name]} (requires {pinned})")
+
+    if missing:
+        return False, f"Missing required packages: {', '.join(missing)}"
+    if mismatched:
+        return True, f"All required packages are installed; version differs for: {', '.join(mismatched)}"
+    return True, "All required packages are installed"
+
+async def test_database_connection() -> CheckResult:
     """Test connection to Supabase database"""
+    from db import Database
+
+    database = Database(os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY"))
     try:
-        from supabase import create_client
-        
-        supabase_url = os.environ.get("SUPABASE_URL")
-        supabase_key = os.environ.get("SUPABASE_KEY")
-        
-        # Try to connect
-        supabase = create_client(supabase_url, supabase_key)
-        
-        # Simple test query
-        response = supabase.table("projects").select("id", count="exact").limit(1).execute()
-        
-        print("✅ Successfully connected to Supabase")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to connect to Supabase: {e}")
-        return False
+        # Reads at most one row; an exact count would scan the whole table
+        await database.client.table("projects").select("id").limit(1).execute()
+    finally:
+        await database.close()
+    return True, "Successfully connected to Supabase"
 
-def test_telegram_token():
+async def test_telegram_token(client: Any) -> CheckResult:
     """Test if the Telegram token is valid"""
-    try:
-        import httpx
-        
-        token = os.environ.get("TELEGRAM_TOKEN")
-        url = f"https://api.telegram.org/bot{token}/getMe"
-        
-        response = httpx.get(url, timeout=10.0)
-        data = response.json()
-        
-        if data.get("ok"):
-            bot_info = data.get("result", {})
-            bot_name = bot_info.get("first_name", "Unknown")
-            bot_username = bot_info.get("username", "Unknown")
-            print(f"✅ Telegram token is valid for bot: {bot_name} (@{bot_username})")
-            return True
-        else:
-            print(f"❌ Invalid Telegram token: {data.get('description', 'Unknown error')}")
-            return False
-    except Exception as e:
-        print(f"❌ Failed to validate Telegram token: {e}")
-        return False
+    token = os.environ.get("TELEGRAM_TOKEN")
+    response = await client.get(f"https://api.telegram.org/bot{token}/getMe")
+    data = response.json()
 
-def test_google_ai():
-    """Test if the Google AI API key is valid"""
-    try:
-        import google.generativeai as genai
-        
-        api_key = os.environ.get("GOOGLE_API_KEY")
-        genai.configure(api_key=api_key)
-        
-        # Simple test
-        model = genai.GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content("Say hello!")
-        
-        print("✅ Successfully connected to Google AI API")
-        return True
-    except Exception as e:
-        print(f"❌ Failed to connect to Google AI API: {e}")
-        return False
+    if data.get("ok"):
+        bot_info = data.get("result", {})
+        bot_name = bot_info.get("first_name", "Unknown")
+        bot_username = bot_info.get("username", "Unknown")
+        return True, f"Telegram token is valid for bot: {bot_name} (@{bot_username})"
+    return False, f"Invalid Telegram token: {data.get('description', 'Unknown error')}"
+
+async def test_google_ai(client: Any) -> CheckResult:
+    """Test if the Google AI API key is valid and can see the bot's model
+
+    Fetches the model's metadata, which checks the key without spending a generation.
+    """
+    model = os.environ.get("LLM_MODEL", "gemini-2.0-flash")
+    response = await client.get(
+        f"{GEMINI_API_URL}/{model}",
+        headers={"x-goog-api-key": os.environ.get("GOOGLE_API_KEY", "")},
+    )
+    if response.status_code != 200:
+        try:
+            message = response.json().get("error", {}).get("message", response.text)
+        except ValueError:
+            message = response.text
+        return False, f"Google AI API rejected the key for {model}: {message}"
+    return True, f"Successfully connected to Google AI API ({response.json().get('displayName', model)})"
 
 def generate_railway_toml():
     """Generate a railway.toml configuration file"""
@@ -101,79 +124,115 @@ def generate_railway_toml():
         },
         "deploy": {
             "startCommand": "python bot.py",
-            "healthcheckPath": "/",
+            "healthcheckPath": "/health",
             "healthcheckTimeout": 300,
             "restartPolicyType": "on-failure",
             "restartPolicyMaxRetries": 10
         }
     }
-    
+
     with open("railway.toml", "w") as f:
         import toml
         toml.dump(config, f)
-    
+
     print("✅ Generated railway.toml configuration file")
 
-def check_dependencies():
-    """Check if all required packages are installed"""
+def _fingerprint(name: str, depends_on: List[str]) -> str:
+    """Hash of what a check's result depends on; secrets are never written to the cache in clear"""
+    parts = [name, sys.executable] + [os.environ.get(var, "") for var in depends_on]
+    if name == "dependencies":
+        try:
+            with open("requirements.txt", "rb") as f:
+                parts.append(hashlib.sha256(f.read()).hexdigest())
+        except OSError:
+            pass
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+def load_cache(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_cache(path: str, results: List[Dict[str, Any]]) -> None:
+    try:
+        with open(path, "w") as f:
+            json.dump({result["name"]: {**result, "cached": False} for result in results}, f, indent=2)
+    except OSError as e:
+        print(f"⚠️ Could not write {path}: {e}", file=sys.stderr)
+
+async def _timed(name: str, check: Callable[[], Awaitable[CheckResult]], timeout: float) -> Dict[str, Any]:
+    started = time.perf_counter()
     try:
-        # Run pip freeze and compare with requirements.txt
-        pip_output = subprocess.check_output(["pip", "freeze"], universal_newlines=True)
-        installed_packages = set(pip_output.strip().split("\n"))
-        
-        with open("requirements.txt", "r") as f:
-            required_packages = set(f.read().strip().split("\n"))
-        
-        # Extract package names without versions for comparison
-        installed_names = {pkg.split("==")[0].lower() for pkg in installed_packages}
-        required_names = {pkg.split("==")[0].lower() for pkg in required_packages}
-        
-        missing = required_names - installed_names
-        
-        if missing:
-            print("❌ Missing required packages:")
-            for pkg in missing:
-                print(f"  - {pkg}")
-            return False
-        
-        print("✅ All required packages are installed")
-        return True
+        ok, detail = await asyncio.wait_for(check(), timeout)
+    except asyncio.TimeoutError:
+        ok, detail = False, f"Timed out after {timeout:g}s"
     except Exception as e:
-        print(f"❌ Failed to check dependencies: {e}")
-        return False
+        ok, detail = False, f"{type(e).__name__}: {e}"
+    return {
+        "name": name,
+        "ok": ok,
+        "detail": detail,
+        "seconds": round(time.perf_counter() - started, 3),
+        "checked_at": time.time(),
+    }
+
+async def run_checks(timeout: float = 10.0, cache_ttl: float = 300.0, cache_path: Optional[str] = CACHE_FILE) -> List[Dict[str, Any]]:
+    """Run every check concurrently, reusing passing results cached less than ``cache_ttl`` seconds ago"""
+    import httpx
+
+    async with httpx.AsyncClient(timeout=timeout) as client:
+        checks = {
+            "environment": (check_environment, REQUIRED_VARS),
+            "dependencies": (check_dependencies, []),
+            "database": (test_database_connection, ["SUPABASE_URL", "SUPABASE_KEY"]),
+            "telegram": (lambda: test_telegram_token(client), ["TELEGRAM_TOKEN"]),
+            "google_ai": (lambda: test_google_ai(client), ["GOOGLE_API_KEY", "LLM_MODEL"]),
+        }
+        cache = load_cache(cache_path) if cache_path and cache_ttl > 0 else {}
+        now = time.time()
+
+        async def run(name: str) -> Dict[str, Any]:
+            check, depends_on = checks[name]
+            fingerprint = _fingerprint(name, depends_on)
+            cached = cache.get(name)
+            # Only passing results are reused, so a fix shows up on the next run
+            if (cached and cached.get("ok") and cached.get("fingerprint") == fingerprint
+                    and now - cached.get("checked_at", 0) < cache_ttl):
+                return {**cached, "cached": True}
+            result = await _timed(name, check, timeout)
+            return {**result, "fingerprint": fingerprint, "cached": False}
 
-def prepare_for_deployment(platform):
-    """Run all checks and prepare for deployment"""
+        results = list(await asyncio.gather(*(run(name) for name in checks)))
+
+    if cache_path and cache_ttl > 0:
+        save_cache(cache_path, results)
+    return results
+
+def print_results(results: List[Dict[str, Any]]) -> None:
+    for result in results:
+        icon = "✅" if result["ok"] else "❌"
+        source = "cached" if result["cached"] else f"{result['seconds'] * 1000:.0f}ms"
+        print(f"{icon} {result['name']}: {result['detail']} ({source})")
+
+def prepare_for_deployment(platform, results):
+    """Report the checks and prepare for deployment"""
     print(f"\n🚀 Preparing for deployment to {platform}...\n")
-    
-    all_checks_passed = True
-    
-    # Run all checks
-    if not check_environment():
-        all_checks_passed = False
-    
-    if not check_dependencies():
-        all_checks_passed = False
-    
-    if not test_database_connection():
-        all_checks_passed = False
-    
-    if not test_telegram_token():
-        all_checks_passed = False
-    
-    if not test_google_ai():
-        all_checks_passed = False
-    
+
+    print_results(results)
+    all_checks_passed = all(result["ok"] for result in results)
+
     # Generate platform-specific files
     if platform.lower() == "railway":
         generate_railway_toml()
-    
+
     # Final summary
     print("\n" + "="*50)
     if all_checks_passed:
         print("✅ All checks passed! Ready for deployment.")
         print(f"\nNext steps for {platform} deployment:")
-        
+
         if platform.lower() == "railway":
             print("1. Push your code to GitHub")
             print("2. Create a new project on Railway")
@@ -190,12 +249,24 @@ def prepare_for_deployment(platform):
             print("7. Deploy your application")
     else:
         print("❌ Some checks failed. Please fix the issues before deploying.")
-    
+
     print("="*50)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Helper script for deploying Jeff Jr")
-    parser.add_argument("platform", choices=["railway", "render"], help="The platform to deploy to")
+    parser.add_argument("platform", nargs="?", choices=["railway", "render"], help="The platform to deploy to (omit to only run the checks)")
+    parser.add_argument("--json", action="store_true", help="Print the check results as JSON and generate no files")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds allowed per check")
+    parser.add_argument("--cache-ttl", type=float, default=300.0, help="Seconds a passing result is reused (0 disables the cache)")
+    parser.add_argument("--cache-file", default=CACHE_FILE, help="Where check results are cached")
     args = parser.parse_args()
-    
-    prepare_for_deployment(args.platform)
\ No newline at end of file
+
+    results = asyncio.run(run_checks(args.timeout, args.cache_ttl, args.cache_file))
+    if args.json:
+        report = [{key: value for key, value in result.items() if key != "fingerprint"} for result in results]
+        print(json.dumps({"ok": all(result["ok"] for result in results), "checks": report}, indent=2))
+    elif args.platform:
+        prepare_for_deployment(args.platform, results)
+    else:
+        print_results(results)
+    sys.exit(0 if all(result["ok"] for result in results) else 1)
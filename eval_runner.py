@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+eval_runner.py - Run a JSONL corpus of founder prompts through Jeff Jr's prompt and check the replies
+
+Each case is answered with the bot's own persona, contents builder and
+generation settings, through llm.LLMPool, so the calls are bounded by
+--concurrency, throttled by --qps and fail over between API keys as in
+production. Replies are cached on disk, keyed by a hash of the contents
+and the model config, so a rerun only calls Gemini for cases whose prompt,
+project or config changed. The report covers latency, estimated tokens
+and the persona rules (2-3 sentences, at most one emoji). --fake answers
+offline with bench.fakes.FakeModel to exercise the pipeline at scale.
+
+    python eval_runner.py evals/cases.jsonl --concurrency 8 --qps 5
+    python eval_runner.py evals/cases.jsonl --fake --repeat 100 --json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from llm import GENERATION_CONFIG, SAFETY_SETTINGS, Backend, LLMPool, create_backends
+from prompts import SYSTEM_PROMPT, build_contents, estimate_tokens
+from ratelimit import TokenBucket
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_CACHE_DIR = ".eval_cache"
+
+# Persona rules from SYSTEM_PROMPT's response guidelines
+MIN_SENTENCES = 2
+MAX_SENTENCES = 3
+MAX_EMOJIS = 1
+
+_SENTENCE_END = re.compile(r"[.!?]+(?=\s|$)")
+_EMOJI = re.compile(
+    "[\U0001F1E6-\U0001F1FF\U0001F300-\U0001F5FF\U0001F600-\U0001F64F\U0001F680-\U0001F6FF"
+    "\U0001F900-\U0001F9FF\U0001FA70-\U0001FAFF\u2600-\u26FF\u2700-\u27BF]"
+)
+
+
+def count_sentences(text: str) -> int:
+    """Sentences in ``text``; a trailing fragment without end punctuation counts as one."""
+    text = text.strip()
+    ends = list(_SENTENCE_END.finditer(text))
+    trailing = text[ends[-1].end():].strip() if ends else text
+    # Emojis after the last full stop decorate that sentence rather than starting a new one
+    return len(ends) + (1 if _EMOJI.sub("", trailing).strip() else 0)
+
+
+def count_emojis(text: str) -> int:
+    return len(_EMOJI.findall(text))
+
+
+def check_rules(reply: str) -> Dict[str, bool]:
+    sentences = count_sentences(reply)
+    return {
+        "sentences": MIN_SENTENCES <= sentences <= MAX_SENTENCES,
+        "emojis": count_emojis(reply) <= MAX_EMOJIS,
+    }
+
+
+def load_cases(path: str, repeat: int = 1) -> List[Dict[str, Any]]:
+    """Cases from a JSONL file: ``id``, ``prompt`` and optional ``project``, ``history``, ``summary``."""
+    cases = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            if not case.get("prompt"):
+                raise ValueError(f"{path}:{number}: case has no prompt")
+            case.setdefault("id", f"case-{number}")
+            cases.append(case)
+    if repeat > 1:
+        # Distinct prompts per copy, so each one is a separate call and cache entry
+        cases = [
+            {**case, "id": f"{case['id']}#{copy}", "prompt": f"{case['prompt']} (variant {copy})"}
+            for copy in range(1, repeat + 1)
+            for case in cases
+        ]
+    return cases
+
+
+def case_contents(case: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return build_contents(case.get("history", []), case["prompt"], case.get("project"), summary=case.get("summary"))
+
+
+def cache_key(model_name: str, contents: List[Dict[str, Any]]) -> str:
+    """Hash of everything that shapes the reply: model, persona, settings and contents."""
+    config = {
+        "model": model_name,
+        "system_instruction": SYSTEM_PROMPT,
+        "generation_config": GENERATION_CONFIG,
+        "safety_settings": SAFETY_SETTINGS,
+        "contents": contents,
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """One JSON file per reply under ``directory``; ``None`` disables caching."""
+
+    def __init__(self, directory: Optional[str]) -> None:
+        self.directory = Path(directory) if directory else None
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if self.directory is None:
+            return None
+        try:
+            return json.loads((self.directory / f"{key}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        if self.directory is None:
+            return
+        path = self.directory / f"{key}.json"
+        partial = path.with_suffix(".tmp")
+        partial.write_text(json.dumps(result), encoding="utf-8")
+        os.replace(partial, path)
+
+
+async def run_case(
+    case: Dict[str, Any], pool: LLMPool, cache: ResultCache, model_name: str, slots: asyncio.Semaphore
+) -> Dict[str, Any]:
+    contents = case_contents(case)
+    key = cache_key(model_name, contents)
+    result: Dict[str, Any] = {"id": case["id"], "prompt": case["prompt"]}
+    cached = cache.get(key)
+    if cached is not None:
+        result.update(cached, cached_result=True)
+    else:
+        # A slot here matches one in the pool, so the timing excludes queueing (but not --qps waits)
+        async with slots:
+            started = time.perf_counter()
+            try:
+                reply = await pool.generate(contents)
+            except Exception as e:
+                # Not cached, so the next run tries again
+                result.update(error=f"{type(e).__name__}: {e}", cached_result=False)
+                return result
+        fresh = {
+            "reply": reply,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "prompt_tokens": estimate_tokens(SYSTEM_PROMPT) + sum(
+                estimate_tokens(part) for content in contents for part in content["parts"]
+            ),
+            "reply_tokens": estimate_tokens(reply),
+        }
+        cache.put(key, fresh)
+        result.update(fresh, cached_result=False)
+    result["rules"] = check_rules(result["reply"])
+    return result
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(results: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+    answered = [result for result in results if "reply" in result]
+    fresh = [result["latency_ms"] for result in answered if not result["cached_result"]]
+    rules = sorted({rule for result in answered for rule in result["rules"]})
+    return {
+        "cases": len(results),
+        "answered": len(answered),
+        "errors": len(results) - len(answered),
+        "cached": sum(1 for result in answered if result["cached_result"]),
+        "elapsed_seconds": round(elapsed, 2),
+        # Latency of the calls made in this run; cached replies keep the latency they were fetched with
+        "latency_ms": {
+            "p50": percentile(fresh, 50),
+            "p95": percentile(fresh, 95),
+            "p99": percentile(fresh, 99),
+            "max": max(fresh, default=0.0),
+        },
+        "tokens": {
+            "prompt_total": sum(result["prompt_tokens"] for result in answered),
+            "reply_total": sum(result["reply_tokens"] for result in answered),
+            "reply_mean": round(sum(result["reply_tokens"] for result in answered) / len(answered), 1) if answered else 0.0,
+        },
+        "rules": {
+            rule: round(sum(result["rules"][rule] for result in answered) / len(answered) * 100, 1)
+            for rule in rules
+        },
+        "failures": [
+            result["id"] for result in results
+            if "error" in result or not all(result["rules"].values())
+        ],
+    }
+
+
+def build_pool(args: argparse.Namespace) -> LLMPool:
+    rate_limit = TokenBucket(args.qps) if args.qps > 0 else None
+    if args.fake:
+        from bench.fakes import FakeModel, Latency
+
+        backends = [Backend(FakeModel(Latency(args.fake_latency_ms / 1000)), name="fake")]
+    else:
+        api_keys = list(dict.fromkeys(
+            [os.environ.get("GOOGLE_API_KEY")]
+            + [key.strip() for key in os.environ.get("GOOGLE_API_KEYS", "").split(",") if key.strip()]
+        ))
+        backends = create_backends(args.model, [key for key in api_keys if key], SYSTEM_PROMPT)
+    return LLMPool(backends, max_concurrency=args.concurrency, timeout=args.timeout, rate_limit=rate_limit)
+
+
+async def evaluate(cases: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    pool = build_pool(args)
+    cache = ResultCache(None if args.no_cache else args.cache_dir)
+    model_name = "fake" if args.fake else args.model
+    slots = asyncio.Semaphore(args.concurrency)
+    started = time.perf_counter()
+    try:
+        results = await asyncio.gather(*(run_case(case, pool, cache, model_name, slots) for case in cases))
+    finally:
+        pool.shutdown()
+    report = summarize(list(results), time.perf_counter() - started)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+    return report
+
+
+def print_report(report: Dict[str, Any], args: argparse.Namespace) -> None:
+    print(f"\n=== EVAL: {report['cases']} cases in {report['elapsed_seconds']}s ===")
+    print(f"✅ Answered: {report['answered']} ({report['cached']} from cache), ❌ errors: {report['errors']}")
+    latency = report["latency_ms"]
+    print(f"⏱️ Latency of new calls: p50 {latency['p50']}ms, p95 {latency['p95']}ms, p99 {latency['p99']}ms")
+    tokens = report["tokens"]
+    print(f"🔢 Estimated tokens: {tokens['prompt_total']} in, {tokens['reply_total']} out ({tokens['reply_mean']} per reply)")
+    for rule, rate in report["rules"].items():
+        print(f"📏 {rule}: {rate}% pass")
+    if report["failures"]:
+        shown = report["failures"][:args.show_failures]
+        more = len(report["failures"]) - len(shown)
+        print(f"\nFailing cases: {', '.join(shown)}" + (f" and {more} more" if more > 0 else ""))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Evaluate Jeff Jr replies over a JSONL corpus of cases")
+    parser.add_argument("cases", nargs="?", default="evals/cases.jsonl", help="JSONL file of cases")
+    parser.add_argument("--model", default=os.environ.get("LLM_MODEL", "gemini-2.0-flash"), help="Gemini model to evaluate")
+    parser.add_argument("--concurrency", type=int, default=8, help="Gemini requests in flight at once")
+    parser.add_argument("--qps", type=float, default=0, help="Max Gemini requests per second (0 = unlimited)")
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds allowed per reply, retries included")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help="Where replies are cached between runs")
+    parser.add_argument("--no-cache", action="store_true", help="Call the model for every case")
+    parser.add_argument("--fake", action="store_true", help="Answer offline with a fake model")
+    parser.add_argument("--fake-latency-ms", type=float, default=50, help="Mean latency of the fake model")
+    parser.add_argument("--repeat", type=int, default=1, help="Run each case this many times, as distinct prompts")
+    parser.add_argument("--output", help="Write every case's result to this JSONL file")
+    parser.add_argument("--show-failures", type=int, default=20, help="Failing case ids to list")
+    parser.add_argument("--min-pass-rate", type=float, help="Exit non-zero if any rule passes less than this percent")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.fake and not (os.environ.get("GOOGLE_API_KEY") or os.environ.get("GOOGLE_API_KEYS")):
+        print("❌ GOOGLE_API_KEY must be set (or pass --fake to run offline)")
+        sys.exit(1)
+    try:
+        cases = load_cases(args.cases, args.repeat)
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not load cases: {e}")
+        sys.exit(1)
+    report = asyncio.run(evaluate(cases, args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, args)
+
+    if report["errors"]:
+        sys.exit(1)
+    if args.min_pass_rate is not None and any(rate < args.min_pass_rate for rate in report["rules"].values()):
+        print(f"\n❌ A persona rule passed less than {args.min_pass_rate}% of cases")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
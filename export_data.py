@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+export_data.py - Stream the projects and conversations tables to JSONL/CSV and summarize them
+
+Rows are read in keyset-paginated pages (``WHERE id > last_id ORDER BY id
+LIMIT n``), written out as each page arrives and folded into the
+aggregates in the same pass, so memory stays bounded by the page size
+(plus one counter per user for the per-user aggregates).
+
+    python export_data.py conversations --format csv --output conversations.csv.gz
+    python export_data.py projects --stats-only
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import IO, Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from db import Database
+
+# Load environment variables
+load_dotenv()
+
+TABLES = ("projects", "conversations")
+
+
+class LengthHistogram:
+    """Message lengths in fixed-width buckets, for percentiles without keeping every value."""
+
+    def __init__(self, bucket_width: int = 10, max_length: int = 4096) -> None:
+        self.bucket_width = bucket_width
+        self.counts = [0] * (max_length // bucket_width + 1)
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def add(self, length: int) -> None:
+        self.counts[min(length // self.bucket_width, len(self.counts) - 1)] += 1
+        self.count += 1
+        self.total += length
+        self.max = max(self.max, length)
+
+    def percentile(self, pct: float) -> int:
+        """Upper edge of the bucket holding the ``pct``th percentile."""
+        target = pct / 100 * self.count
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if bucket and seen >= target:
+                return min((index + 1) * self.bucket_width, self.max)
+        return self.max
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 1) if self.count else 0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+def _distribution(per_user: Counter) -> Dict[str, Any]:
+    values = sorted(per_user.values())
+    if not values:
+        return {"users": 0}
+    return {
+        "users": len(values),
+        "mean": round(sum(values) / len(values), 1),
+        "p50": values[len(values) // 2],
+        "p90": values[min(len(values) - 1, int(len(values) * 0.9))],
+        "max": values[-1],
+    }
+
+
+class ConversationStats:
+    def __init__(self) -> None:
+        self.rows = 0
+        self.roles: Counter = Counter()
+        self.turns_per_user: Counter = Counter()
+        self.reply_lengths = LengthHistogram()
+        self.message_lengths = LengthHistogram()
+        self.first_timestamp: Optional[str] = None
+        self.last_timestamp: Optional[str] = None
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self.rows += 1
+        role = row.get("role") or "unknown"
+        self.roles[role] += 1
+        length = len(row.get("message") or "")
+        if role == "assistant":
+            self.reply_lengths.add(length)
+        else:
+            self.turns_per_user[row.get("user_id")] += 1
+            self.message_lengths.add(length)
+        timestamp = row.get("timestamp")
+        if timestamp:
+            if self.first_timestamp is None or timestamp < self.first_timestamp:
+                self.first_timestamp = timestamp
+            if self.last_timestamp is None or timestamp > self.last_timestamp:
+                self.last_timestamp = timestamp
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "roles": dict(self.roles),
+            "user_turns_per_user": _distribution(self.turns_per_user),
+            "user_message_length": self.message_lengths.report(),
+            "reply_length": self.reply_lengths.report(),
+            "first_timestamp": self.first_timestamp,
+            "last_timestamp": self.last_timestamp,
+        }
+
+
+class ProjectStats:
+    def __init__(self) -> None:
+        self.rows = 0
+        self.stages: Counter = Counter()
+        self.projects_per_user: Counter = Counter()
+
+    def add(self, row: Dict[str, Any]) -> None:
+        self.rows += 1
+        self.stages[row.get("stage") or "unknown"] += 1
+        self.projects_per_user[row.get("user_id")] += 1
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "stages": dict(self.stages.most_common()),
+            "projects_per_user": _distribution(self.projects_per_user),
+        }
+
+
+class RowWriter:
+    """Writes rows as JSON lines or CSV, opening the file lazily; ``.gz`` paths are compressed."""
+
+    def __init__(self, path: str, fmt: str) -> None:
+        self.path = path
+        self.fmt = fmt
+        self._file: Optional[IO[str]] = None
+        self._csv: Optional[csv.DictWriter] = None
+
+    def _open(self) -> IO[str]:
+        if self.path == "-":
+            return sys.stdout
+        if self.path.endswith(".gz"):
+            return gzip.open(self.path, "wt", encoding="utf-8", newline="")
+        return open(self.path, "w", encoding="utf-8", newline="")
+
+    def write(self, rows: List[Dict[str, Any]]) -> None:
+        if self._file is None:
+            self._file = self._open()
+        if self.fmt == "jsonl":
+            self._file.writelines(json.dumps(row, ensure_ascii=False, default=str) + "\n" for row in rows)
+            return
+        if self._csv is None:
+            self._csv = csv.DictWriter(self._file, fieldnames=list(rows[0]), extrasaction="ignore")
+            self._csv.writeheader()
+        self._csv.writerows(rows)
+
+    def close(self) -> None:
+        if self._file is not None and self._file is not sys.stdout:
+            self._file.close()
+
+
+async def export(args: argparse.Namespace) -> Dict[str, Any]:
+    db = Database(os.environ["SUPABASE_URL"], os.environ["SUPABASE_KEY"], pool_size=2, timeout=args.timeout)
+    stats = ConversationStats() if args.table == "conversations" else ProjectStats()
+    writer = None if args.stats_only else RowWriter(args.output, args.format)
+    last_id = args.after_id
+    started = time.monotonic()
+    try:
+        async for page in db.iter_rows(args.table, after_id=args.after_id, page_size=args.page_size):
+            if writer is not None:
+                writer.write(page)
+            for row in page:
+                stats.add(row)
+            last_id = page[-1]["id"]
+            if args.progress:
+                print(f"... {stats.rows} rows, last id {last_id}", file=sys.stderr)
+    except Exception as e:
+        # Keep what was written; --after-id resumes from here
+        print(f"❌ Export stopped after id {last_id}: {e}", file=sys.stderr)
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+        await db.close()
+
+    report = stats.report()
+    report["table"] = args.table
+    report["last_id"] = last_id
+    report["elapsed_seconds"] = round(time.monotonic() - started, 2)
+    return report
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export and summarize Jeff Jr's Supabase tables")
+    parser.add_argument("table", choices=TABLES)
+    parser.add_argument("--format", choices=["jsonl", "csv"], default="jsonl")
+    parser.add_argument("--output", default="-", help="File to write rows to ('-' for stdout, .gz to compress)")
+    parser.add_argument("--stats-only", action="store_true", help="Only compute aggregates, don't write rows")
+    parser.add_argument("--after-id", type=int, default=0, help="Resume after this id")
+    parser.add_argument("--page-size", type=int, default=1000)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-page request timeout in seconds")
+    parser.add_argument("--progress", action="store_true", help="Log each page to stderr")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    if not os.environ.get("SUPABASE_URL") or not os.environ.get("SUPABASE_KEY"):
+        print("❌ SUPABASE_URL and SUPABASE_KEY must be set")
+        sys.exit(1)
+    try:
+        report = asyncio.run(export(args))
+    except Exception:
+        sys.exit(1)
+    # Rows on stdout would be mixed up with the report, so it goes to stderr then
+    out = sys.stderr if args.output == "-" and not args.stats_only else sys.stdout
+    print(json.dumps(report, indent=2), file=out)
+
+
+if __name__ == "__main__":
+    main()
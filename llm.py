@@ -0,0 +1,524 @@
+"""
+llm.py - Bounded, non-blocking, failover-aware access to Gemini for the bot's handlers
+"""
+
+import asyncio
+import contextlib
+import functools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "top_k": 40,
+    "max_output_tokens": 150,
+}
+
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE",
+    },
+]
+
+
+@functools.lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[type, ...]:
+    """Rate limiting (429) and server-side failures (5xx), which are worth another try.
+
+    Imported on first use: google.api_core pulls in grpc.
+    """
+    from google.api_core import exceptions as google_exceptions
+
+    return (
+        google_exceptions.TooManyRequests,
+        google_exceptions.ResourceExhausted,
+        google_exceptions.ServerError,
+    )
+
+
+class LLMUnavailableError(Exception):
+    """Raised without calling Gemini when every backend's circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops sending requests to a backend after repeated failures.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    the backend is skipped for ``reset_timeout`` seconds. Then a single trial
+    request is let through: success closes the circuit, failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.trips = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    @property
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._trial_in_progress)
+
+    def allow(self) -> bool:
+        """Whether a request may be sent now; claims the trial slot when half-open."""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_progress:
+            self._trial_in_progress = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_in_progress = False
+        if self._opened_at is not None or self.failures >= self.failure_threshold:
+            if self._opened_at is None:
+                self.trips += 1
+            self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Give back an unused trial slot (e.g. the request was cancelled)."""
+        self._trial_in_progress = False
+
+
+class Backend:
+    """One model reachable with one API key, behind its own circuit breaker.
+
+    Pass ``factory`` instead of ``model`` to build the model on first use.
+    """
+
+    def __init__(
+        self,
+        model: Any = None,
+        name: str = "",
+        api_key: Optional[str] = None,
+        breaker: Optional[CircuitBreaker] = None,
+        factory: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self._model = model
+        self._factory = factory
+        self._lock = threading.Lock()
+        self.name = name
+        self.api_key = api_key
+        self.breaker = breaker or CircuitBreaker()
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def built(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self) -> Any:
+        if self._model is None:
+            # LLMPool.warm_up builds models on a worker thread while handlers may already run
+            with self._lock:
+                if self._model is None:
+                    self._model = self._factory()
+        return self._model
+
+    def bind(self) -> Any:
+        """The model, with clients for this backend's key attached on first use.
+
+        ``genai.configure`` is process-wide, so each key gets its own clients.
+        They are created inside the running event loop, as the SDK does.
+        """
+        if self.api_key is not None and getattr(self.model, "_async_client", True) is None:
+            from google.ai import generativelanguage as glm
+
+            options = {"api_key": self.api_key}
+            self.model._client = glm.GenerativeServiceClient(client_options=options)
+            self.model._async_client = glm.GenerativeServiceAsyncClient(client_options=options)
+        return self.model
+
+
+def create_backends(
+    model_name: str,
+    api_keys: Sequence[str],
+    system_instruction: str,
+    failure_threshold: int = 5,
+    reset_timeout: float = 30.0,
+) -> List[Backend]:
+    """One backend per API key for ``model_name``, configured with Jeff Jr's settings.
+
+    The models are built on first use, so google.generativeai (grpc,
+    protobuf) isn't imported until then; see ``LLMPool.warm_up``.
+    """
+
+    def build_model() -> Any:
+        import google.generativeai as genai
+
+        return genai.GenerativeModel(
+            model_name=model_name,
+            system_instruction=system_instruction,
+            generation_config=GENERATION_CONFIG,
+            safety_settings=SAFETY_SETTINGS,
+        )
+
+    return [
+        Backend(
+            name=f"{model_name}/key{index}",
+            api_key=api_key,
+            breaker=CircuitBreaker(failure_threshold, reset_timeout),
+            factory=build_model,
+        )
+        for index, api_key in enumerate(api_keys, start=1)
+    ]
+
+
+class LLMPool:
+    """Caps in-flight Gemini requests, keeps generation off the event loop and fails over.
+
+    Requests go through the model's async API when it has one; otherwise the
+    blocking ``generate_content`` call runs on a dedicated thread pool so it
+    never shares threads with the rest of the application.
+
+    Requests rotate across ``backends`` (typically one per API key). A 429 or
+    5xx moves the request to the next healthy backend, then to ``fallbacks``
+    (a cheaper model) once every primary backend has failed or tripped its
+    circuit; when all of them have failed it backs off with jitter and goes
+    round again, up to ``max_retries`` retries. If every circuit is open the
+    request fails immediately with ``LLMUnavailableError`` instead of queueing.
+    ``rate_limit``, if given, is shared by every call (retries included) to
+    keep the total request rate under the account's quota.
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[Backend],
+        max_concurrency: int = 8,
+        timeout: float = 30.0,
+        use_threads: bool = False,
+        fallbacks: Sequence[Backend] = (),
+        max_retries: int = 3,
+        base_backoff: float = 0.5,
+        max_backoff: float = 8.0,
+        rate_limit: Optional[TokenBucket] = None,
+    ) -> None:
+        self.backends = list(backends)
+        self.fallbacks = list(fallbacks)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.rate_limit = rate_limit
+        self._rotation = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Models built lazily by create_backends are Gemini's, which have the async API
+        if use_threads or not all(
+            hasattr(backend.model, "generate_content_async")
+            for backend in self._all_backends()
+            if backend.built
+        ):
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_concurrency, thread_name_prefix="llm"
+            )
+
+        # Queue-depth and outcome metrics
+        self.waiting = 0
+        self.in_flight = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.retries = 0
+        self.fallback_requests = 0
+        self.shed = 0
+        self.throttled_seconds = 0.0
+        self.total_wait_seconds = 0.0
+        self.total_generation_seconds = 0.0
+
+    def _all_backends(self) -> List[Backend]:
+        return self.backends + self.fallbacks
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the pool's queue depth and outcome counters."""
+        finished = self.completed + self.timeouts + self.errors
+        return {
+            "max_concurrency": self.max_concurrency,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "retries": self.retries,
+            "fallback_requests": self.fallback_requests,
+            "shed": self.shed,
+            "throttled_seconds": self.throttled_seconds,
+            "avg_wait_seconds": self.total_wait_seconds / finished if finished else 0.0,
+            "avg_generation_seconds": (
+                self.total_generation_seconds / finished if finished else 0.0
+            ),
+            "circuits": {backend.name: backend.breaker.state for backend in self._all_backends()},
+        }
+
+    def _check_available(self) -> None:
+        if not any(backend.breaker.available for backend in self._all_backends()):
+            self.shed += 1
+            raise LLMUnavailableError("Every Gemini backend's circuit is open")
+
+    @contextlib.asynccontextmanager
+    async def _slot(self) -> AsyncIterator[None]:
+        """Wait for a free slot, tracking queue depth and time spent waiting."""
+        queued_at = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.monotonic()
+        self.total_wait_seconds += started_at - queued_at
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.total_generation_seconds += time.monotonic() - started_at
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def _timed_out(self) -> None:
+        self.timeouts += 1
+        logger.warning(
+            f"LLM request timed out after {self.timeout}s "
+            f"({self.in_flight} in flight, {self.waiting} waiting)"
+        )
+
+    def _pick(self, failed: Set[int]) -> Optional[Backend]:
+        """The next healthy backend not yet failed by this request, primaries first."""
+        self._rotation += 1
+        for tier in (self.backends, self.fallbacks):
+            for offset in range(len(tier)):
+                backend = tier[(self._rotation + offset) % len(tier)]
+                if id(backend) not in failed and backend.breaker.allow():
+                    return backend
+        return None
+
+    def _backoff(self, round_number: int) -> float:
+        # Full jitter keeps retries from many users from arriving in lockstep
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** round_number))
+
+    async def _with_failover(
+        self,
+        deadline: float,
+        call: Callable[[Backend, float], Awaitable[Any]],
+    ) -> Any:
+        """Run ``call(backend, seconds_left)`` on healthy backends until one succeeds."""
+        failed: Set[int] = set()
+        last_error: Optional[Exception] = None
+        rounds = 0
+        for attempt in range(self.max_retries + 1):
+            backend = self._pick(failed)
+            if backend is None and failed:
+                # Every healthy backend failed this request once; wait, then go round again
+                delay = self._backoff(rounds)
+                rounds += 1
+                if time.monotonic() + delay >= deadline:
+                    break
+                await asyncio.sleep(delay)
+                failed.clear()
+                backend = self._pick(failed)
+            if backend is None:
+                break
+
+            try:
+                await self._throttle(deadline)
+            except asyncio.TimeoutError:
+                backend.breaker.release()
+                raise
+            remaining = deadline - time.monotonic()
+            if attempt:
+                self.retries += 1
+            if backend in self.fallbacks:
+                self.fallback_requests += 1
+            backend.requests += 1
+            try:
+                result = await asyncio.wait_for(call(backend, remaining), timeout=remaining)
+            except asyncio.TimeoutError:
+                backend.failures += 1
+                backend.breaker.record_failure()
+                raise
+            except retryable_errors() as e:
+                backend.failures += 1
+                backend.breaker.record_failure()
+                failed.add(id(backend))
+                last_error = e
+                logger.warning(f"Gemini backend {backend.name} failed ({type(e).__name__}: {e})")
+                continue
+            finally:
+                backend.breaker.release()
+            backend.breaker.record_success()
+            return result
+
+        if last_error is not None:
+            raise last_error
+        self.shed += 1
+        raise LLMUnavailableError("Every Gemini backend's circuit is open")
+
+    async def _throttle(self, deadline: float) -> None:
+        """Wait for the global rate limit, raising ``asyncio.TimeoutError`` past ``deadline``."""
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        if self.rate_limit is not None:
+            started = time.monotonic()
+            await self.rate_limit.acquire(timeout=remaining)
+            self.throttled_seconds += time.monotonic() - started
+
+    async def generate(self, contents: List[Any]) -> str:
+        """Generate a reply for ``contents`` and return its text.
+
+        Raises ``asyncio.TimeoutError`` if no answer arrives within ``timeout``
+        seconds (retries included; time spent queued for a slot is not), and
+        ``LLMUnavailableError`` when every backend is circuit-broken.
+        """
+        self._check_available()
+        async with self._slot():
+            deadline = time.monotonic() + self.timeout
+            try:
+                text = await self._with_failover(
+                    deadline, lambda backend, remaining: self._generate(backend, contents)
+                )
+            except asyncio.TimeoutError:
+                self._timed_out()
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            self.completed += 1
+            return text
+
+    async def stream(self, contents: List[Any]) -> AsyncIterator[str]:
+        """Yield the reply to ``contents`` as text chunks while it is generated.
+
+        Holds a pool slot until the stream is exhausted or closed. ``timeout``
+        bounds the whole generation, not each chunk. Failover happens only
+        before the first chunk; once text has been shown, errors propagate.
+        With the thread-pool fallback the reply arrives as a single chunk.
+        """
+        self._check_available()
+        async with self._slot():
+            deadline = time.monotonic() + self.timeout
+            try:
+                if self._executor is not None:
+                    yield await self._with_failover(
+                        deadline, lambda backend, remaining: self._generate(backend, contents)
+                    )
+                else:
+                    first, chunks = await self._with_failover(
+                        deadline, lambda backend, remaining: self._open_stream(backend, contents)
+                    )
+                    chunk = first
+                    while chunk is not None:
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            # Chunks without text parts (e.g. a final safety verdict)
+                            text = ""
+                        if text:
+                            yield text
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise asyncio.TimeoutError()
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=remaining)
+                        except StopAsyncIteration:
+                            chunk = None
+            except asyncio.TimeoutError:
+                self._timed_out()
+                raise
+            except GeneratorExit:
+                # Consumer stopped early; the slot is still released below
+                raise
+            except Exception:
+                self.errors += 1
+                raise
+            self.completed += 1
+
+    async def _open_stream(self, backend: Backend, contents: List[Any]) -> Tuple[Any, Any]:
+        """Start streaming and wait for the first chunk, so connection errors surface here."""
+        response = await backend.bind().generate_content_async(contents, stream=True)
+        chunks = response.__aiter__()
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return first, chunks
+
+    async def _generate(self, backend: Backend, contents: List[Any]) -> str:
+        model = backend.bind()
+        if self._executor is None:
+            response = await model.generate_content_async(contents)
+        else:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(
+                self._executor, model.generate_content, contents
+            )
+        return response.text
+
+    async def warm_up(self) -> None:
+        """Build every backend's model on a worker thread, off the event loop.
+
+        Started in the background at startup so the first request doesn't
+        pay for importing the Gemini SDK; a request that arrives first
+        simply builds its backend itself.
+        """
+        def build() -> None:
+            retryable_errors()
+            for backend in self._all_backends():
+                backend.model
+
+        started = time.monotonic()
+        try:
+            await asyncio.to_thread(build)
+        except Exception as e:
+            logger.error(f"Failed to prepare Gemini models: {e}")
+            return
+        logger.info(f"Gemini models ready in {time.monotonic() - started:.2f}s")
+
+    def shutdown(self) -> None:
+        """Release the fallback thread pool, if one was created."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,167 @@
+"""
+metrics.py - Hot-path timing spans, counters and Prometheus text exposition
+"""
+
+import contextlib
+import contextvars
+import json
+import logging
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+turn_logger = logging.getLogger("jeffjr.turns")
+
+PREFIX = "jeffjr_"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+GaugeValue = Union[float, Dict[str, float]]
+
+_counters: Dict[str, Dict[Labels, float]] = {}
+_histograms: Dict[str, Dict[Labels, List[float]]] = {}
+_help: Dict[str, str] = {}
+_callbacks: List[Tuple[str, str, str, Optional[str], Callable[[], GaugeValue]]] = []
+
+# (stage timings, notes) of the chat turn the current task is handling, if any
+_current_turn: contextvars.ContextVar[Optional[Tuple[Dict[str, float], Dict[str, float]]]] = (
+    contextvars.ContextVar("current_turn", default=None)
+)
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def inc(name: str, amount: float = 1.0, help: str = "", **labels: str) -> None:
+    """Increment counter ``name`` (``_total`` is appended on export)."""
+    series = _counters.setdefault(name, {})
+    key = _labels(labels)
+    series[key] = series.get(key, 0.0) + amount
+    if help:
+        _help.setdefault(name, help)
+
+
+def observe(name: str, seconds: float, **labels: str) -> None:
+    """Record ``seconds`` in histogram ``name``."""
+    series = _histograms.setdefault(name, {})
+    key = _labels(labels)
+    counts = series.get(key)
+    if counts is None:
+        # One slot per bucket, then +Inf, then the running sum
+        counts = series[key] = [0.0] * (len(BUCKETS) + 2)
+    for i, bound in enumerate(BUCKETS):
+        if seconds <= bound:
+            counts[i] += 1
+    counts[len(BUCKETS)] += 1
+    counts[len(BUCKETS) + 1] += seconds
+
+
+def register_gauge(
+    name: str,
+    help: str,
+    read: Callable[[], GaugeValue],
+    label: Optional[str] = None,
+    kind: str = "gauge",
+) -> None:
+    """Export a value read at scrape time, e.g. a queue depth owned by another component.
+
+    ``read`` returns a number, or a dict keyed by values of ``label``. Use
+    ``kind="counter"`` for monotonically increasing totals kept elsewhere.
+    """
+    _callbacks.append((name, help, kind, label, read))
+
+
+@contextlib.contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time a hot-path stage (db_read, llm, db_write, telegram_send, ...)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        observe("stage_seconds", elapsed, stage=stage)
+        current = _current_turn.get()
+        if current is not None:
+            timings = current[0]
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def note(key: str, value: float = 1.0) -> None:
+    """Attach a value (e.g. a cache hit) to the current turn's latency log line."""
+    current = _current_turn.get()
+    if current is not None:
+        notes = current[1]
+        notes[key] = notes.get(key, 0.0) + value
+
+
+@contextlib.asynccontextmanager
+async def turn(handler: str, user_id: int):
+    """Time one chat turn end to end and log its per-stage breakdown as a JSON line."""
+    timings: Dict[str, float] = {}
+    notes: Dict[str, float] = {}
+    token = _current_turn.set((timings, notes))
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        _current_turn.reset(token)
+        total = time.perf_counter() - started
+        observe("turn_seconds", total, handler=handler)
+        inc("turns", handler=handler, outcome=outcome)
+        record = {"event": "turn", "handler": handler, "user_id": user_id, "outcome": outcome,
+                  "total_ms": round(total * 1000, 1)}
+        for stage, seconds in timings.items():
+            record[f"{stage}_ms"] = round(seconds * 1000, 1)
+        record.update(notes)
+        turn_logger.info(json.dumps(record))
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    body = ",".join(f'{key}="{value}"' for key, value in pairs)
+    return "{" + body + "}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for name, series in _counters.items():
+        full = f"{PREFIX}{name}_total"
+        if name in _help:
+            lines.append(f"# HELP {full} {_help[name]}")
+        lines.append(f"# TYPE {full} counter")
+        for labels, value in series.items():
+            lines.append(f"{full}{_format_labels(labels)} {value}")
+
+    for name, series in _histograms.items():
+        full = f"{PREFIX}{name}"
+        lines.append(f"# TYPE {full} histogram")
+        for labels, counts in series.items():
+            for i, bound in enumerate(BUCKETS):
+                lines.append(f"{full}_bucket{_format_labels(labels, (('le', str(bound)),))} {counts[i]}")
+            lines.append(f"{full}_bucket{_format_labels(labels, (('le', '+Inf'),))} {counts[len(BUCKETS)]}")
+            lines.append(f"{full}_count{_format_labels(labels)} {counts[len(BUCKETS)]}")
+            lines.append(f"{full}_sum{_format_labels(labels)} {counts[len(BUCKETS) + 1]}")
+
+    for name, help, kind, label, read in _callbacks:
+        full = f"{PREFIX}{name}"
+        try:
+            value = read()
+        except Exception as e:
+            logger.warning(f"Could not read metric {full}: {e}")
+            continue
+        lines.append(f"# HELP {full} {help}")
+        lines.append(f"# TYPE {full} {kind}")
+        if isinstance(value, dict):
+            for label_value, number in value.items():
+                lines.append(f'{full}{{{label}="{label_value}"}} {number}')
+        else:
+            lines.append(f"{full} {value}")
+    return "\n".join(lines) + "\n"
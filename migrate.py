@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+"""
+migrate.py - Versioned schema migrations, conversation partitioning and query-plan checks
+
+Connects straight to Postgres (Supabase: Project Settings -> Database ->
+Connection string) via DATABASE_URL or --dsn.
+
+    python migrate.py status
+    python migrate.py up
+    python migrate.py check
+    python migrate.py partition --months-ahead 3
+    python migrate.py create-partitions --months-ahead 3
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+NO_TRANSACTION_MARKER = "-- migrate: no-transaction"
+# Arbitrary key so two runners (e.g. two deploys) never apply migrations at once
+ADVISORY_LOCK_KEY = 0x6A656666
+
+SCHEMA_MIGRATIONS = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    checksum TEXT NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+# The bot's queries (see db.py), with the index each must be served by
+HOT_QUERIES = [
+    {
+        "name": "latest project",
+        "sql": "SELECT * FROM projects WHERE user_id = %(user_id)s ORDER BY created_at DESC LIMIT 1",
+        "table": "projects",
+        "index": "idx_projects_user_created",
+    },
+    {
+        "name": "recent conversations",
+        "sql": "SELECT * FROM conversations WHERE user_id = %(user_id)s ORDER BY timestamp DESC LIMIT 20",
+        "table": "conversations",
+        "index": "idx_conversations_user_timestamp",
+    },
+    {
+        "name": "turns to summarize",
+        "sql": (
+            "SELECT * FROM conversations WHERE project_id = %(project_id)s "
+            "AND timestamp > %(since)s ORDER BY timestamp LIMIT 50"
+        ),
+        "table": "conversations",
+        "index": "idx_conversations_project_timestamp",
+    },
+    {
+        "name": "project summary",
+        "sql": "SELECT * FROM project_summaries WHERE project_id = %(project_id)s LIMIT 1",
+        "table": "project_summaries",
+        "index": "project_summaries_pkey",
+    },
+    {
+        "name": "export page",
+        "sql": "SELECT * FROM conversations WHERE id > %(after_id)s ORDER BY id LIMIT 1000",
+        "table": "conversations",
+        "index": "conversations_pkey",
+    },
+]
+
+
+def connect(dsn: str):
+    import psycopg2
+
+    return psycopg2.connect(dsn)
+
+
+def load_migrations() -> List[Tuple[str, str, str]]:
+    """(version, name, sql) for every ``NNNN_name.sql`` file, in version order."""
+    migrations = []
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        match = re.match(r"(\d+)_(.+)\.sql$", path.name)
+        if match:
+            migrations.append((match.group(1), match.group(2), path.read_text()))
+    return migrations
+
+
+def checksum(sql: str) -> str:
+    return hashlib.sha256(sql.encode()).hexdigest()
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split a script on semicolons that end a line, dropping comment-only chunks."""
+    statements = []
+    for chunk in re.split(r";\s*$", sql, flags=re.MULTILINE):
+        code = "\n".join(line for line in chunk.splitlines() if not line.strip().startswith("--"))
+        if code.strip():
+            statements.append(code.strip())
+    return statements
+
+
+def applied_migrations(conn) -> Dict[str, str]:
+    with conn, conn.cursor() as cursor:
+        cursor.execute(SCHEMA_MIGRATIONS)
+        cursor.execute("SELECT version, checksum FROM schema_migrations")
+        return dict(cursor.fetchall())
+
+
+def invalid_indexes(conn) -> List[str]:
+    with conn, conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE NOT i.indisvalid AND n.nspname = current_schema()"
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def apply_migration(conn, version: str, name: str, sql: str) -> None:
+    record = (
+        "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+        (version, name, checksum(sql)),
+    )
+    if NO_TRANSACTION_MARKER in sql:
+        # CREATE INDEX CONCURRENTLY can't run inside a transaction block
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                for statement in split_statements(sql):
+                    cursor.execute(statement)
+        finally:
+            conn.autocommit = False
+        broken = invalid_indexes(conn)
+        if broken:
+            raise RuntimeError(f"Invalid indexes left behind: {', '.join(broken)}; drop them and rerun")
+        with conn, conn.cursor() as cursor:
+            cursor.execute(*record)
+    else:
+        with conn, conn.cursor() as cursor:
+            cursor.execute(sql)
+            cursor.execute(*record)
+
+
+def command_status(conn, args: argparse.Namespace) -> int:
+    applied = applied_migrations(conn)
+    for version, name, sql in load_migrations():
+        if version not in applied:
+            state = "pending"
+        elif applied[version] != checksum(sql):
+            state = "applied (file changed since)"
+        else:
+            state = "applied"
+        print(f"{version} {name}: {state}")
+    return 0
+
+
+def command_up(conn, args: argparse.Namespace) -> int:
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (ADVISORY_LOCK_KEY,))
+    try:
+        applied = applied_migrations(conn)
+        pending = [m for m in load_migrations() if m[0] not in applied]
+        for version, name, sql in load_migrations():
+            if version in applied and applied[version] != checksum(sql):
+                print(f"⚠️  {version} {name} was edited after it was applied; not re-running it")
+        if not pending:
+            print("✅ Schema is up to date")
+            return 0
+        for version, name, sql in pending:
+            print(f"🔄 Applying {version} {name}...")
+            apply_migration(conn, version, name, sql)
+            print(f"✅ Applied {version} {name}")
+        return 0
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (ADVISORY_LOCK_KEY,))
+        conn.commit()
+
+
+def _plan_nodes(plan: Dict[str, Any]) -> List[Dict[str, Any]]:
+    nodes = [plan]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+def check_plan(
+    plan: Dict[str, Any],
+    query: Dict[str, Any],
+    parent_index: Callable[[str], str] = lambda name: name,
+) -> List[str]:
+    """Problems with ``plan`` (EXPLAIN FORMAT JSON's "Plan") for ``query``; empty if it's fine.
+
+    ``parent_index`` maps a partition's copy of an index to the index it was
+    created from, so partitioned tables are checked against the same names.
+    """
+    problems = []
+    nodes = _plan_nodes(plan)
+    scans = [node for node in nodes if node.get("Relation Name", "").startswith(query["table"])]
+    for node in nodes:
+        node_type = node["Node Type"]
+        if node_type in ("Sort", "Incremental Sort"):
+            problems.append(f"{node_type} on {', '.join(node.get('Sort Key', []))}")
+    for node in scans:
+        node_type = node["Node Type"]
+        index = parent_index(node.get("Index Name", ""))
+        if node_type not in ("Index Scan", "Index Only Scan"):
+            problems.append(f"{node_type} on {node['Relation Name']}")
+        elif query["index"] is not None and index != query["index"]:
+            problems.append(f"uses {index} instead of {query['index']}")
+        elif query.get("index_only") and node_type != "Index Only Scan":
+            problems.append(f"{node_type} instead of Index Only Scan")
+    if not scans:
+        problems.append(f"no scan of {query['table']} in plan")
+    return problems
+
+
+def _sample_params(conn) -> Dict[str, Any]:
+    with conn, conn.cursor() as cursor:
+        cursor.execute("SELECT user_id, project_id FROM conversations ORDER BY id DESC LIMIT 1")
+        row = cursor.fetchone()
+    user_id, project_id = row if row else (0, 0)
+    return {
+        "user_id": user_id,
+        "project_id": project_id or 0,
+        "since": datetime(2000, 1, 1, tzinfo=timezone.utc),
+        "after_id": 0,
+    }
+
+
+def _parent_index(conn, name: str) -> str:
+    """The top-level index a partition's index belongs to (``name`` itself if none)."""
+    with conn, conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT relid::regclass::text FROM pg_partition_ancestors(%s::regclass) "
+            "WHERE relid NOT IN (SELECT inhrelid FROM pg_inherits)",
+            (name,),
+        )
+        row = cursor.fetchone()
+    return row[0] if row else name
+
+
+def command_check(conn, args: argparse.Namespace) -> int:
+    params = _sample_params(conn)
+    failures = 0
+    results = []
+    for query in HOT_QUERIES:
+        with conn, conn.cursor() as cursor:
+            if not args.as_is:
+                # Small dev tables make sequential scans cheapest; ask whether an index path exists
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute("SET LOCAL enable_bitmapscan = off")
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {query['sql']}", params)
+            plan = cursor.fetchone()[0][0]["Plan"]
+        problems = check_plan(plan, query, lambda name: _parent_index(conn, name) if name else name)
+        failures += bool(problems)
+        results.append({"query": query["name"], "ok": not problems, "problems": problems})
+        if not args.json:
+            status = "✅" if not problems else "❌"
+            print(f"{status} {query['name']}" + (f": {'; '.join(problems)}" if problems else ""))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    return 1 if failures else 0
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+def create_partitions(cursor, start: date, months_ahead: int) -> List[str]:
+    """Create monthly conversations partitions from ``start`` to ``months_ahead`` past today."""
+    from psycopg2 import sql
+
+    end = _month_start(date.today())
+    for _ in range(months_ahead + 1):
+        end = _next_month(end)
+    created = []
+    month = _month_start(start)
+    while month < end:
+        name = f"conversations_{month:%Y_%m}"
+        cursor.execute(
+            sql.SQL(
+                "CREATE TABLE IF NOT EXISTS {} PARTITION OF conversations "
+                "FOR VALUES FROM (%s) TO (%s)"
+            ).format(sql.Identifier(name)),
+            (month, _next_month(month)),
+        )
+        created.append(name)
+        month = _next_month(month)
+    return created
+
+
+def is_partitioned(cursor) -> bool:
+    cursor.execute(
+        "SELECT c.relkind FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace "
+        "WHERE c.relname = 'conversations' AND n.nspname = current_schema()"
+    )
+    row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+PARTITIONED_CONVERSATIONS = """
+CREATE TABLE conversations (
+    id INTEGER NOT NULL DEFAULT nextval('conversations_id_seq'),
+    user_id BIGINT NOT NULL,
+    project_id INTEGER REFERENCES projects(id),
+    message TEXT NOT NULL,
+    role TEXT NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp)
+"""
+
+
+def command_partition(conn, args: argparse.Namespace) -> int:
+    """Rebuild conversations as a table range-partitioned by month on ``timestamp``.
+
+    Runs in one transaction and holds an exclusive lock on conversations
+    while rows are copied, so run it in a quiet window. Rows without a
+    timestamp are stamped with the epoch on the way over.
+    """
+    with conn, conn.cursor() as cursor:
+        if is_partitioned(cursor):
+            print("✅ conversations is already partitioned")
+            return 0
+        cursor.execute("LOCK TABLE conversations IN ACCESS EXCLUSIVE MODE")
+        cursor.execute("SELECT min(timestamp) FROM conversations")
+        oldest = cursor.fetchone()[0]
+        cursor.execute("ALTER TABLE conversations RENAME TO conversations_unpartitioned")
+        # Index names are schema-wide, so free them up for the new table
+        cursor.execute(
+            "ALTER TABLE conversations_unpartitioned "
+            "RENAME CONSTRAINT conversations_pkey TO conversations_unpartitioned_pkey"
+        )
+        index_statements = [
+            statement
+            for statement in split_statements((MIGRATIONS_DIR / "0002_hot_path_indexes.sql").read_text())
+            if statement.startswith("CREATE INDEX") and "ON conversations" in statement
+        ]
+        for statement in index_statements:
+            name = re.search(r"IF NOT EXISTS (\w+)", statement).group(1)
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+        cursor.execute(PARTITIONED_CONVERSATIONS)
+        for statement in index_statements:
+            # Plain CREATE INDEX on the empty parent; every partition gets its own copy
+            cursor.execute(statement.replace(" CONCURRENTLY", ""))
+        created = create_partitions(cursor, (oldest or datetime.now(timezone.utc)).date(), args.months_ahead)
+        cursor.execute("CREATE TABLE IF NOT EXISTS conversations_default PARTITION OF conversations DEFAULT")
+        cursor.execute(
+            "INSERT INTO conversations (id, user_id, project_id, message, role, timestamp) "
+            "SELECT id, user_id, project_id, message, role, COALESCE(timestamp, 'epoch') "
+            "FROM conversations_unpartitioned"
+        )
+        copied = cursor.rowcount
+        cursor.execute("ALTER SEQUENCE conversations_id_seq OWNED BY conversations.id")
+        cursor.execute("DROP TABLE conversations_unpartitioned")
+        cursor.execute("ANALYZE conversations")
+        # Tell PostgREST (Supabase's REST layer) to pick up the replaced table
+        cursor.execute("NOTIFY pgrst, 'reload schema'")
+    print(f"✅ Partitioned conversations: {copied} rows across {len(created)} monthly partitions")
+    return 0
+
+
+def command_create_partitions(conn, args: argparse.Namespace) -> int:
+    """Pre-create upcoming monthly partitions; run it from a monthly cron job."""
+    with conn, conn.cursor() as cursor:
+        if not is_partitioned(cursor):
+            print("❌ conversations is not partitioned; run `python migrate.py partition` first")
+            return 1
+        created = create_partitions(cursor, date.today(), args.months_ahead)
+    print(f"✅ Partitions present through {created[-1]}")
+    return 0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Manage Jeff Jr's Postgres schema")
+    parser.add_argument("--dsn", default=os.environ.get("DATABASE_URL"), help="Postgres URL (default: DATABASE_URL)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="List migrations and whether they are applied")
+    commands.add_parser("up", help="Apply pending migrations")
+    check = commands.add_parser("check", help="EXPLAIN the bot's queries and verify they use their indexes")
+    check.add_argument("--as-is", action="store_true", help="Don't discourage sequential scans (for production-sized data)")
+    check.add_argument("--json", action="store_true")
+    for name, help_text in (
+        ("partition", "Convert conversations to monthly range partitions"),
+        ("create-partitions", "Create upcoming monthly partitions"),
+    ):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--months-ahead", type=int, default=3)
+    return parser.parse_args()
+
+
+COMMANDS = {
+    "status": command_status,
+    "up": command_up,
+    "check": command_check,
+    "partition": command_partition,
+    "create-partitions": command_create_partitions,
+}
+
+
+def main() -> None:
+    args = parse_args()
+    if not args.dsn:
+        print("❌ Set DATABASE_URL or pass --dsn")
+        sys.exit(1)
+    conn = connect(args.dsn)
+    try:
+        sys.exit(COMMANDS[args.command](conn, args))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+-- Tables as originally created by hand from setup_db.py; a no-op on existing installs.
+
+CREATE TABLE IF NOT EXISTS projects (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    username TEXT,
+    project_name TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    revenue_goal TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS conversations (
+    id SERIAL PRIMARY KEY,
+    user_id BIGINT NOT NULL,
+    project_id INTEGER REFERENCES projects(id),
+    message TEXT NOT NULL,
+    role TEXT NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS project_summaries (
+    project_id INTEGER PRIMARY KEY REFERENCES projects(id),
+    user_id BIGINT NOT NULL,
+    summary TEXT NOT NULL,
+    summarized_until TIMESTAMP WITH TIME ZONE,
+    turns_summarized INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_projects_user_id ON projects(user_id);
+CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations(user_id);
+CREATE INDEX IF NOT EXISTS idx_conversations_project_id ON conversations(project_id);
@@ -0,0 +1,33 @@
+-- migrate: no-transaction
+--
+-- Composite indexes matching the bot's hot queries, so each is a short
+-- index range scan in the query's ORDER BY with no sort step:
+--   projects      WHERE user_id = ? ORDER BY created_at DESC LIMIT 1
+--   conversations WHERE user_id = ? ORDER BY timestamp DESC LIMIT n
+--   conversations WHERE project_id = ? AND timestamp > ? ORDER BY timestamp LIMIT n
+--
+-- Built CONCURRENTLY so writes continue on large tables. A build that fails
+-- leaves an INVALID index that IF NOT EXISTS would skip; `migrate.py up`
+-- refuses to record the migration while one exists, so drop it and rerun.
+--
+-- The bot selects every column, and messages can exceed the ~2.7kB btree
+-- entry limit, so the text columns are not INCLUDEd: these stay index scans
+-- that touch at most LIMIT heap rows. Index-only scans apply to the id-only
+-- and count queries, which the primary keys already cover.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_projects_user_created
+    ON projects (user_id, created_at DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_user_timestamp
+    ON conversations (user_id, timestamp DESC);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_project_timestamp
+    ON conversations (project_id, timestamp);
+
+-- Leading columns of the composites above, so they only cost writes now
+DROP INDEX CONCURRENTLY IF EXISTS idx_projects_user_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_conversations_user_id;
+DROP INDEX CONCURRENTLY IF EXISTS idx_conversations_project_id;
+
+ANALYZE projects;
+ANALYZE conversations;
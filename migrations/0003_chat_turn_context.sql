@@ -0,0 +1,43 @@
+-- Everything a chat turn reads, in one round trip, for when the bot's
+-- session cache is cold (first turn after a restart or an idle expiry):
+-- the user's latest project, their last p_history_limit conversation rows
+-- (oldest first) and that project's rolling summary. PostgREST exposes it
+-- as POST /rest/v1/rpc/chat_turn_context.
+--
+-- Each part is one of the indexed hot queries from 0002; the function only
+-- saves the HTTP round trips between them. Conversation rows are written
+-- by the bot's batched write-behind, off the reply path, so no insert is
+-- folded in here.
+
+CREATE OR REPLACE FUNCTION chat_turn_context(p_user_id BIGINT, p_history_limit INTEGER DEFAULT 20)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH latest_project AS (
+        SELECT *
+        FROM projects
+        WHERE user_id = p_user_id
+        ORDER BY created_at DESC
+        LIMIT 1
+    ),
+    recent AS (
+        SELECT *
+        FROM conversations
+        WHERE user_id = p_user_id
+        ORDER BY timestamp DESC
+        LIMIT p_history_limit
+    )
+    SELECT jsonb_build_object(
+        'project', (SELECT to_jsonb(p) FROM latest_project p),
+        'history', COALESCE((SELECT jsonb_agg(to_jsonb(c) ORDER BY c.timestamp) FROM recent c), '[]'::jsonb),
+        'summary', (
+            SELECT to_jsonb(s)
+            FROM project_summaries s
+            WHERE s.project_id = (SELECT id FROM latest_project)
+        )
+    );
+$$;
+
+-- Let PostgREST see the new function without a restart
+NOTIFY pgrst, 'reload schema';
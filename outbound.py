@@ -0,0 +1,157 @@
+"""
+outbound.py - Flood-control-aware pacing of every Bot API call, and splitting of long replies
+"""
+
+import asyncio
+import logging
+import time
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+
+from cachetools import TTLCache
+from telegram import Message
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Split ``text`` into chunks Telegram accepts, preferring paragraph, line and word breaks."""
+    chunks = []
+    while len(text) > limit:
+        cut = -1
+        for separator in ("\n\n", "\n", " "):
+            cut = text.rfind(separator, 0, limit)
+            # A break in the first half would leave a stub of a message; cut harder instead
+            if cut > limit // 2:
+                break
+        if cut <= limit // 2:
+            cut = limit
+        chunks.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
+
+
+async def reply_in_parts(message: Message, text: str) -> Message:
+    """Reply with ``text``, split over several messages if it is too long; returns the last one."""
+    for chunk in split_message(text):
+        sent = await message.reply_text(chunk)
+    return sent
+
+
+def _seconds(retry_after: Union[int, float, timedelta]) -> float:
+    if isinstance(retry_after, timedelta):
+        return retry_after.total_seconds()
+    return float(retry_after)
+
+
+class OutboundRateLimiter(BaseRateLimiter[None]):
+    """Paces outgoing Bot API calls under Telegram's flood limits instead of failing them.
+
+    Every call takes a token from a global bucket of ``overall_rate`` per
+    second. Calls to a chat also take one from that chat's bucket:
+    ``chat_rate`` per second for private chats and ``group_rate`` for
+    groups and channels (negative ids), each allowing bursts of
+    ``chat_burst``. Calls wait their turn in arrival order, so bursts are
+    smoothed rather than dropped. When Telegram still answers RetryAfter,
+    every call is held back for the time it asks for and the failed call is
+    retried, up to ``max_retries`` times. A rate of zero disables that limit.
+    """
+
+    def __init__(
+        self,
+        overall_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20 / 60,
+        chat_burst: int = 3,
+        max_retries: int = 3,
+        max_chats: int = 100000,
+    ) -> None:
+        self.overall = TokenBucket(overall_rate) if overall_rate > 0 else None
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        # A bucket idle long enough to refill completely is the same as a new one
+        slowest = min(rate for rate in (chat_rate, group_rate, 1.0) if rate > 0)
+        self._chats: TTLCache = TTLCache(maxsize=max_chats, ttl=chat_burst / slowest)
+        self._paused_until = 0.0
+        self.requests = 0
+        self.flood_waits = 0
+        self.throttled_seconds = 0.0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def _chat_bucket(self, chat_id: Any) -> Optional[TokenBucket]:
+        try:
+            is_group = int(chat_id) < 0
+        except (TypeError, ValueError):
+            # "@channelusername"
+            is_group = True
+        rate = self.group_rate if is_group else self.chat_rate
+        if rate <= 0:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(rate, self.chat_burst)
+        # Re-inserting refreshes the entry's TTL
+        self._chats[chat_id] = bucket
+        return bucket
+
+    async def _wait_turn(self, chat_id: Any) -> None:
+        started = time.monotonic()
+        pause = self._paused_until - started
+        if pause > 0:
+            await asyncio.sleep(pause)
+        if chat_id is not None:
+            bucket = self._chat_bucket(chat_id)
+            if bucket is not None:
+                await bucket.acquire()
+        if self.overall is not None:
+            await self.overall.acquire()
+        self.throttled_seconds += time.monotonic() - started
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[None],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        chat_id = data.get("chat_id")
+        retries = 0
+        while True:
+            await self._wait_turn(chat_id)
+            self.requests += 1
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if retries >= self.max_retries:
+                    raise
+                retries += 1
+                delay = _seconds(e.retry_after)
+                self.flood_waits += 1
+                # Telegram's limit is account-wide, so everything waits, not just this chat
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                logger.warning(f"Telegram flood control on {endpoint}: retrying in {delay:g}s")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "flood_waits": self.flood_waits,
+            "throttled_seconds": self.throttled_seconds,
+            "chats_tracked": len(self._chats),
+        }
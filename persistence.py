@@ -0,0 +1,276 @@
+"""
+persistence.py - Durable ConversationHandler states and user_data across restarts
+"""
+
+import asyncio
+import contextlib
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+logger = logging.getLogger(__name__)
+
+ConversationKey = Tuple[str, str]
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS conversation_states (
+        name TEXT NOT NULL,
+        key TEXT NOT NULL,
+        state INTEGER NOT NULL,
+        PRIMARY KEY (name, key)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_states (
+        user_id BIGINT PRIMARY KEY,
+        data TEXT NOT NULL
+    )
+    """,
+]
+
+UPSERT_STATE = (
+    "INSERT INTO conversation_states (name, key, state) VALUES ({p}, {p}, {p}) "
+    "ON CONFLICT (name, key) DO UPDATE SET state = excluded.state"
+)
+DELETE_STATE = "DELETE FROM conversation_states WHERE name = {p} AND key = {p}"
+UPSERT_USER = (
+    "INSERT INTO user_states (user_id, data) VALUES ({p}, {p}) "
+    "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data"
+)
+DELETE_USER = "DELETE FROM user_states WHERE user_id = {p}"
+
+
+class SQLiteStateStore:
+    """State tables in a local SQLite file, accessed through aiosqlite."""
+
+    placeholder = "?"
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._db = None
+
+    async def open(self) -> None:
+        import aiosqlite
+
+        self._db = await aiosqlite.connect(self.path)
+        await self._db.execute("PRAGMA journal_mode=WAL")
+        for statement in SCHEMA:
+            await self._db.execute(statement)
+        await self._db.commit()
+
+    async def fetch(self, query: str) -> list:
+        async with self._db.execute(query) as cursor:
+            return list(await cursor.fetchall())
+
+    async def write(self, statements: list) -> None:
+        for query, params in statements:
+            await self._db.execute(query, params)
+        await self._db.commit()
+
+    async def close(self) -> None:
+        if self._db is not None:
+            await self._db.close()
+            self._db = None
+
+
+class PostgresStateStore:
+    """State tables in Postgres via psycopg2, run on a worker thread."""
+
+    placeholder = "%s"
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self._conn = None
+
+    async def open(self) -> None:
+        import psycopg2
+
+        self._conn = await asyncio.to_thread(psycopg2.connect, self.dsn)
+        await self.write([(statement, ()) for statement in SCHEMA])
+
+    async def fetch(self, query: str) -> list:
+        def run() -> list:
+            with self._conn, self._conn.cursor() as cursor:
+                cursor.execute(query)
+                return cursor.fetchall()
+
+        return await asyncio.to_thread(run)
+
+    async def write(self, statements: list) -> None:
+        def run() -> None:
+            # One transaction for the whole batch
+            with self._conn, self._conn.cursor() as cursor:
+                for query, params in statements:
+                    cursor.execute(query, params)
+
+        await asyncio.to_thread(run)
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await asyncio.to_thread(self._conn.close)
+            self._conn = None
+
+
+def create_state_store(url: str):
+    """Pick a store from ``url``: ``sqlite:///path`` or ``postgresql://...``."""
+    if url.startswith("sqlite:///"):
+        return SQLiteStateStore(url[len("sqlite:///"):])
+    if url.startswith(("postgres://", "postgresql://")):
+        return PostgresStateStore(url)
+    raise ValueError(f"Unsupported state store URL: {url}")
+
+
+class StatePersistence(BasePersistence):
+    """Persists ConversationHandler states and user_data to a pluggable store.
+
+    The Application hands over changed data every ``update_interval``
+    seconds; changes are buffered and written in one transaction after
+    ``flush_delay`` seconds, so a persistence cycle costs a single write no
+    matter how many users it touched. A failed write is retried with
+    exponential backoff, up to ``max_backoff`` seconds apart, until it
+    succeeds. Everything is loaded once at startup.
+    """
+
+    def __init__(
+        self, store, update_interval: float = 5.0, flush_delay: float = 0.5, max_backoff: float = 60.0
+    ) -> None:
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self.store = store
+        self.flush_delay = flush_delay
+        self.max_backoff = max_backoff
+        self._opened = False
+        self._conversations: Optional[Dict[str, Dict[tuple, object]]] = None
+        self._dirty_states: Dict[ConversationKey, Optional[int]] = {}
+        self._dirty_users: Dict[int, Optional[Dict[str, Any]]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # True while the flush task is waiting, so shutdown can skip the wait
+        self._waiting = False
+        self.failed_writes = 0
+
+    async def _open(self) -> None:
+        if not self._opened:
+            await self.store.open()
+            self._opened = True
+
+    def _sql(self, query: str) -> str:
+        return query.format(p=self.store.placeholder)
+
+    async def get_user_data(self) -> Dict[int, Dict[str, Any]]:
+        await self._open()
+        rows = await self.store.fetch("SELECT user_id, data FROM user_states")
+        return {int(user_id): json.loads(data) for user_id, data in rows}
+
+    async def get_conversations(self, name: str) -> Dict[tuple, object]:
+        await self._open()
+        if self._conversations is None:
+            self._conversations = {}
+            rows = await self.store.fetch("SELECT name, key, state FROM conversation_states")
+            for row_name, key, state in rows:
+                self._conversations.setdefault(row_name, {})[tuple(json.loads(key))] = state
+        return dict(self._conversations.get(name, {}))
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        self._dirty_states[(name, json.dumps(list(key)))] = new_state
+        self._schedule_flush()
+
+    async def update_user_data(self, user_id: int, data: Dict[str, Any]) -> None:
+        self._dirty_users[user_id] = data
+        self._schedule_flush()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._dirty_users[user_id] = None
+        self._schedule_flush()
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[str, Any]) -> None:
+        pass
+
+    # chat_data, bot_data and callback_data are not stored (see store_data above)
+    async def get_chat_data(self) -> Dict[int, Any]:
+        return {}
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_chat_data(self, chat_id: int, data: Any) -> None:
+        pass
+
+    async def update_bot_data(self, data: Any) -> None:
+        pass
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Any) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data: Any) -> None:
+        pass
+
+    def _schedule_flush(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_write())
+
+    async def _delayed_write(self) -> None:
+        delay = self.flush_delay
+        while True:
+            self._waiting = True
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._waiting = False
+            try:
+                await self._write()
+                return
+            except Exception as e:
+                # The changes are still dirty; without a retry they would wait for the next update
+                self.failed_writes += 1
+                delay = min(self.max_backoff, max(1.0, delay * 2))
+                logger.error(f"Failed to persist conversation state, retrying in {delay:g}s: {e}")
+
+    async def _write(self) -> None:
+        states, self._dirty_states = self._dirty_states, {}
+        users, self._dirty_users = self._dirty_users, {}
+        if not states and not users:
+            return
+        statements = []
+        for (name, key), state in states.items():
+            if state is None:
+                statements.append((self._sql(DELETE_STATE), (name, key)))
+            else:
+                statements.append((self._sql(UPSERT_STATE), (name, key, state)))
+        for user_id, data in users.items():
+            if data is None:
+                statements.append((self._sql(DELETE_USER), (user_id,)))
+            else:
+                statements.append((self._sql(UPSERT_USER), (user_id, json.dumps(data, default=str))))
+        try:
+            await self.store.write(statements)
+        except Exception:
+            # Keep the changes for the next attempt unless newer ones replaced them
+            for key, state in states.items():
+                self._dirty_states.setdefault(key, state)
+            for user_id, data in users.items():
+                self._dirty_users.setdefault(user_id, data)
+            raise
+
+    async def flush(self) -> None:
+        if self._flush_task is not None:
+            if self._waiting:
+                # No need to wait out a delay or backoff; the write below covers it
+                self._flush_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._flush_task
+        await self._write()
+        await self.store.close()
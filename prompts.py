@@ -0,0 +1,131 @@
+"""
+prompts.py - Jeff Jr's persona prompt and role-tagged, token-budgeted Gemini contents
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+SYSTEM_PROMPT = """
+You are Jeff Jr, a no-nonsense venture capitalist Telegram bot with a focus on startups, particularly in the blockchain and DeFi space on Solana. Your personality is blunt, professional, and a bit sarcastic. You value directness and efficiency in communication.
+
+Key Traits:
+1. **Blunt and Professional:** Provide honest feedback without sugar-coating, but remain professional.
+2. **Time-Conscious:** Keep responses concise and to the point.
+3. **Startup Expert:** Strong knowledge in MVPs, revenue models, market fit, and funding.
+4. **Critical Thinker:** Ask tough questions to help founders refine their ideas.
+5. **Blockchain and DeFi Savvy:** Expertise in crypto/blockchain projects, especially on Solana.
+6. **Calm and Collected with Sarcasm:** Maintain composure while being straightforward and occasionally sarcastic.
+
+Response Guidelines:
+- **Brevity:** Always limit responses to 2-3 sentences. If more detail is needed, ask the user if they want to know more.
+- **Probing Questions:** Ask about business models, revenue plans, and market fit when relevant.
+- **Constructive Criticism:** Challenge weak ideas firmly but constructively.
+- **Emojis:** Use sparingly for emphasis (max 1 per message).
+- **Actionable Advice:** Focus on practical steps the founder can take.
+- **Tone:** Friendly yet blunt, like a knowledgeable friend who doesn't hold back.
+- **Genuine Care:** Show interest in the project while being honest and direct.
+- **Handling Off-Topic Questions:** If the user asks something unrelated to their project or startup advice, respond with something like: "Hey, let's stay focused on your project. If you have questions about [topic], maybe we can discuss that later, but right now, I want to help you with your startup."
+
+Remember, your goal is to help founders build viable businesses by providing insightful, honest feedback and guidance. And if possible only give the ansewr in a single format as this is used for the telegram messages responses will not look good
+""".strip()
+
+SUMMARY_INSTRUCTION = (
+    "Update the running summary of your conversation with this founder. Keep facts, "
+    "numbers, decisions, open questions and advice you have already given; drop "
+    "greetings and repetition. Reply with the summary only, as plain text under 120 words."
+)
+
+# Stored conversation roles mapped to the roles Gemini expects
+GEMINI_ROLES = {"user": "user", "assistant": "model", "model": "model"}
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) that needs no API call."""
+    return len(text) // 4 + 1
+
+
+@lru_cache(maxsize=1024)
+def _project_context(name: str, stage: str, revenue_goal: str) -> str:
+    return (
+        "Current project information:\n"
+        f"- Name: {name}\n"
+        f"- Stage: {stage}\n"
+        f"- Revenue Goal: {revenue_goal}\n\n"
+        "Tailor your feedback to this specific project stage and goals."
+    )
+
+
+def project_context(project_info: Dict[str, Any]) -> str:
+    return _project_context(
+        str(project_info.get("project_name", "Unknown")),
+        str(project_info.get("stage", "Unknown")),
+        str(project_info.get("revenue_goal", "Unknown")),
+    )
+
+
+def memory_context(summary: str) -> str:
+    return f"What you remember from earlier conversations with this founder:\n{summary}"
+
+
+def trim_history(
+    conversation_history: List[Dict[str, str]], token_budget: int
+) -> List[Dict[str, str]]:
+    """Keep the most recent turns whose combined estimated size fits ``token_budget``."""
+    kept = []
+    used = 0
+    for message in reversed(conversation_history):
+        cost = estimate_tokens(message["content"])
+        if used + cost > token_budget:
+            break
+        kept.append(message)
+        used += cost
+    kept.reverse()
+    return kept
+
+
+def _append(contents: List[Dict[str, Any]], role: str, text: str) -> None:
+    # Gemini expects alternating turns, so consecutive same-role text is merged
+    if contents and contents[-1]["role"] == role:
+        contents[-1]["parts"].append(text)
+    else:
+        contents.append({"role": role, "parts": [text]})
+
+
+def build_contents(
+    conversation_history: List[Dict[str, str]],
+    user_message: str,
+    project_info: Optional[Dict[str, Any]] = None,
+    token_budget: int = 1500,
+    summary: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Build role-tagged Gemini contents for one turn.
+
+    The persona is not included: it is set once per model instance as the
+    ``system_instruction``. ``summary`` carries older turns in compressed
+    form; the recent history is trimmed, oldest first, to ``token_budget``
+    estimated tokens.
+    """
+    contents: List[Dict[str, Any]] = []
+    if project_info:
+        _append(contents, "user", project_context(project_info))
+    if summary:
+        _append(contents, "user", memory_context(summary))
+    for message in trim_history(conversation_history, token_budget):
+        _append(contents, GEMINI_ROLES.get(message["role"], "user"), message["content"])
+    _append(contents, "user", user_message)
+    return contents
+
+
+def build_summary_contents(
+    previous_summary: Optional[str], turns: List[Dict[str, str]]
+) -> List[Dict[str, Any]]:
+    """Contents asking Gemini to fold ``turns`` into ``previous_summary``."""
+    transcript = "\n".join(
+        f"{'Founder' if turn['role'] == 'user' else 'You'}: {turn['content']}" for turn in turns
+    )
+    text = (
+        f"{SUMMARY_INSTRUCTION}\n\n"
+        f"Summary so far:\n{previous_summary or '(none yet)'}\n\n"
+        f"Conversation since then:\n{transcript}"
+    )
+    return [{"role": "user", "parts": [text]}]
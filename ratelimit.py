@@ -0,0 +1,88 @@
+"""
+ratelimit.py - Token buckets for per-user message limits and the global Gemini request rate
+"""
+
+import asyncio
+import time
+from typing import Optional, Set
+
+from cachetools import TTLCache
+
+
+class TokenBucket:
+    """Refills at ``rate`` tokens per second up to ``capacity``.
+
+    ``acquire`` reserves a token immediately and sleeps off any deficit, so
+    waiters are served in arrival order and the long-run rate never exceeds
+    ``rate`` no matter how many tasks share the bucket.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take ``tokens`` if they are available now; never waits."""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> None:
+        """Take ``tokens``, waiting for the refill if needed.
+
+        Raises ``asyncio.TimeoutError`` without taking anything if the wait
+        would exceed ``timeout`` seconds.
+        """
+        self._refill()
+        wait = max(0.0, (tokens - self.tokens) / self.rate)
+        if timeout is not None and wait > timeout:
+            raise asyncio.TimeoutError()
+        # Going negative reserves the tokens for this caller ahead of later ones
+        self.tokens -= tokens
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class UserRateLimiter:
+    """A token bucket per user: ``per_minute`` sustained messages with bursts of ``burst``.
+
+    Buckets of users who have gone quiet long enough to refill completely
+    are dropped, since a fresh bucket is identical.
+    """
+
+    def __init__(self, per_minute: float = 20.0, burst: int = 5, maxsize: int = 100000) -> None:
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self._buckets: TTLCache = TTLCache(maxsize=maxsize, ttl=burst / self.rate)
+        self._notified: Set[int] = set()
+        self.allowed = 0
+        self.rejected = 0
+
+    def allow(self, user_id: int) -> bool:
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+        # Re-inserting refreshes the entry's TTL
+        self._buckets[user_id] = bucket
+        if bucket.try_acquire():
+            self.allowed += 1
+            self._notified.discard(user_id)
+            return True
+        self.rejected += 1
+        return False
+
+    def should_notify(self, user_id: int) -> bool:
+        """True once per run of rejected messages, so the warning itself isn't spammy."""
+        if user_id in self._notified:
+            return False
+        self._notified.add(user_id)
+        return True
@@ -0,0 +1,127 @@
+"""
+response_cache.py - Similarity-matched cache of Jeff Jr replies to common founder questions
+"""
+
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = _NON_WORD.sub(" ", text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def ngrams(text: str, n: int = 3) -> Counter:
+    """Character n-grams of a normalized message, padded so short words still match."""
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+class _Entry:
+    __slots__ = ("grams", "norm", "response", "created_at")
+
+    def __init__(self, grams: Counter, response: str) -> None:
+        self.grams = grams
+        self.norm = math.sqrt(sum(count * count for count in grams.values()))
+        self.response = response
+        self.created_at = time.monotonic()
+
+
+class ResponseCache:
+    """Reuses replies to near-identical questions asked in the same scope.
+
+    A reply is only ever matched against questions with the same ``scope``
+    string. Replies mention the context they were generated with, so the
+    scope must cover it: the bot uses the project id and stage, which keeps
+    one founder's reply from being shown to another.
+
+    Messages are compared by cosine similarity of their character trigrams,
+    found through an inverted index so lookups only score entries sharing at
+    least one trigram with the question. Entries expire after ``ttl`` seconds
+    and the least recently used are evicted beyond ``maxsize``.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.9,
+        ttl: float = 86400.0,
+        maxsize: int = 5000,
+        min_length: int = 20,
+    ) -> None:
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.min_length = min_length
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._index: Dict[str, Set[Tuple[str, str]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, message: str) -> bool:
+        """Short replies like "yes" only make sense in context, so they are never cached."""
+        return len(normalize(message)) >= self.min_length
+
+    def get(self, message: str, scope: str) -> Optional[str]:
+        text = normalize(message)
+        key = (scope, text)
+        entry = self._entries.get(key)
+        if entry is None:
+            key, entry = self._most_similar(scope, ngrams(text))
+        if entry is not None and time.monotonic() - entry.created_at > self.ttl:
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.response
+
+    def put(self, message: str, scope: str, response: str) -> None:
+        text = normalize(message)
+        key = (scope, text)
+        if key in self._entries:
+            self._remove(key)
+        entry = _Entry(ngrams(text), response)
+        self._entries[key] = entry
+        for gram in entry.grams:
+            self._index.setdefault(gram, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def _most_similar(self, scope: str, grams: Counter):
+        norm = math.sqrt(sum(count * count for count in grams.values()))
+        if not norm:
+            return None, None
+        dots: Dict[Tuple[str, str], int] = {}
+        for gram, count in grams.items():
+            for key in self._index.get(gram, ()):
+                if key[0] == scope:
+                    dots[key] = dots.get(key, 0) + count * self._entries[key].grams[gram]
+        best_key, best_score = None, self.threshold
+        for key, dot in dots.items():
+            score = dot / (norm * self._entries[key].norm)
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None, None
+        return best_key, self._entries[best_key]
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key)
+        for gram in entry.grams:
+            keys = self._index.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[gram]
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,209 @@
+"""
+scheduling.py - Update processor that runs different users concurrently and each user in order
+"""
+
+import asyncio
+import contextlib
+import inspect
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Sequence
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def update_key(update: object) -> Optional[int]:
+    """The user an update belongs to, falling back to its chat; None if it has neither."""
+    if isinstance(update, Update):
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+    return None
+
+
+class LaneOverloaded(Exception):
+    """Raised by ``Lane.slot`` when work is shed instead of run."""
+
+
+class Lane:
+    """A class of work with its own concurrency cap, queue-time SLO and load shedding.
+
+    Work waits for one of ``max_concurrent`` slots. It is shed instead of
+    run when ``max_queue`` items are already waiting, or when it has waited
+    longer than ``queue_slo`` seconds by the time a slot frees up: the user
+    has likely given up by then, and running it would only delay the work
+    behind it. Zero disables either check.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int = 0, queue_slo: float = 0.0) -> None:
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_slo = queue_slo
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.waiting = 0
+        self.running = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.shed = 0
+
+    async def acquire(self, queued_at: Optional[float] = None) -> bool:
+        """Wait for a slot; False, holding no slot, if the work should be shed instead.
+
+        ``queued_at`` (``time.monotonic()``) is when the work arrived, if earlier than now.
+        """
+        if queued_at is None:
+            queued_at = time.monotonic()
+        if self.max_queue and self.waiting >= self.max_queue:
+            self.shed += 1
+            return False
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - queued_at
+        metrics.observe("lane_queue_seconds", waited, lane=self.name)
+        if self.queue_slo and waited > self.queue_slo:
+            self._semaphore.release()
+            self.shed += 1
+            return False
+        self.running += 1
+        return True
+
+    def release(self) -> None:
+        self.running -= 1
+        self.completed += 1
+        self._semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def slot(self, queued_at: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold a slot for the body, raising ``LaneOverloaded`` if the work is shed."""
+        if not await self.acquire(queued_at):
+            raise LaneOverloaded(self.name)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "waiting": self.waiting,
+            "running": self.running,
+            "max_waiting": self.max_waiting,
+            "completed": self.completed,
+            "shed": self.shed,
+        }
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates from different users in parallel, each user's strictly in order.
+
+    Each user gets a FIFO lock, so a user's rapid messages can't interleave
+    their history reads and writes. Running handlers then need a slot in
+    their update's lane: ``classify`` names the lane, and an unknown name
+    means the first lane. Slow work can't take the slots of cheap work on
+    another lane. Without ``lanes`` there is one lane of ``max_concurrent``
+    slots. Slots are taken only after the per-user lock, so a user with a
+    long backlog never holds slots that other users' updates could run in.
+    Shed updates never reach their handler; ``on_shed`` is awaited instead.
+    ``max_pending`` bounds the number of updates accepted but not yet
+    finished.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 64,
+        max_pending: int = 4096,
+        lanes: Sequence[Lane] = (),
+        classify: Optional[Callable[[object], str]] = None,
+        on_shed: Optional[Callable[[object, Lane], Awaitable[Any]]] = None,
+    ) -> None:
+        super().__init__(max_concurrent_updates=max_pending)
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in lanes} or {
+            "default": Lane("default", max_concurrent)
+        }
+        self._default_lane = next(iter(self.lanes.values()))
+        self.classify = classify
+        self.on_shed = on_shed
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._queued: Dict[int, int] = {}
+        self.max_queue_length = 0
+
+    @property
+    def running(self) -> int:
+        return sum(lane.running for lane in self.lanes.values())
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    def lane_for(self, update: object) -> Lane:
+        if self.classify is None:
+            return self._default_lane
+        return self.lanes.get(self.classify(update), self._default_lane)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        queued_at = time.monotonic()
+        lane = self.lane_for(update)
+        key = update_key(update)
+        if key is None:
+            await self._run(update, lane, coroutine, queued_at)
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        queued = self._queued.get(key, 0) + 1
+        self._queued[key] = queued
+        self.max_queue_length = max(self.max_queue_length, queued)
+        try:
+            async with lock:
+                await self._run(update, lane, coroutine, queued_at)
+        finally:
+            queued = self._queued[key] - 1
+            if queued:
+                self._queued[key] = queued
+            else:
+                del self._queued[key]
+                del self._locks[key]
+
+    async def _run(self, update: object, lane: Lane, coroutine: Awaitable[Any], queued_at: float) -> None:
+        if not await lane.acquire(queued_at):
+            if inspect.iscoroutine(coroutine):
+                # Never awaited on purpose; closing it avoids the "never awaited" warning
+                coroutine.close()
+            if self.on_shed is not None:
+                try:
+                    await self.on_shed(update, lane)
+                except Exception as e:
+                    logger.error(f"Failed to notify a user of a shed update: {e}")
+            return
+        try:
+            await coroutine
+        finally:
+            lane.release()
+
+    def queue_lengths(self) -> Dict[int, int]:
+        """Updates accepted but not yet finished, per user (including the running one)."""
+        return dict(self._queued)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_users": len(self._queued),
+            "pending_updates": sum(self._queued.values()),
+            "running": self.running,
+            "max_queue_length": self.max_queue_length,
+            "longest_queue": max(self._queued.values(), default=0),
+            "lanes": {name: lane.stats() for name, lane in self.lanes.items()},
+        }
@@ -0,0 +1,216 @@
+"""
+session_cache.py - Per-user cache of the active project and recent turns
+"""
+
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+
+class Turn:
+    """One cached conversation turn.
+
+    Slots instead of a per-turn dict save ~150 bytes a turn, and roles are
+    interned so every turn shares one string per role. Supports
+    ``turn["role"]`` / ``turn["content"]`` so prompt builders that take
+    role/content dicts accept turns unchanged.
+    """
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str) -> None:
+        self.role = sys.intern(role)
+        self.content = content
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def __repr__(self) -> str:
+        return f"Turn({self.role!r}, {self.content!r})"
+
+
+def _dict_bytes(data: Dict[str, Any]) -> int:
+    # Keys are column names shared by every row, so only the values are counted
+    return sys.getsizeof(data) + sum(sys.getsizeof(value) for value in data.values())
+
+
+class Session:
+    """Cached state for one user: their latest project and last N turns."""
+
+    __slots__ = ("project", "history", "history_loaded", "last_used", "nbytes")
+
+    def __init__(self, history_size: int) -> None:
+        self.project: Optional[Dict[str, Any]] = None
+        self.history: Deque[Turn] = deque(maxlen=history_size)
+        # False until history has been loaded from the database once
+        self.history_loaded = False
+        self.last_used = 0.0
+        # Estimated size of this session, kept current as it changes
+        self.nbytes = 0
+
+
+_TURN_BYTES = sys.getsizeof(Turn("user", ""))
+
+
+def _turn_bytes(turn: Turn) -> int:
+    return _TURN_BYTES + sys.getsizeof(turn.content)
+
+
+class SessionCache:
+    """Bounded LRU cache of sessions keyed by user_id, with idle expiry.
+
+    The bot writes every conversation row itself, so once a user's history
+    has been loaded it is kept current in place and later turns need no
+    database reads.
+
+    Each user holds at most ``history_size`` turns. The least recently used
+    sessions are evicted when there are more than ``maxsize`` of them, when
+    their estimated total size exceeds ``max_bytes`` (0 means no byte cap),
+    or once they have been idle for ``ttl`` seconds.
+    """
+
+    def __init__(
+        self, maxsize: int = 10000, ttl: float = 3600.0, history_size: int = 10, max_bytes: int = 0
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.history_size = history_size
+        self.max_bytes = max_bytes
+        # Least recently used first
+        self._sessions: "OrderedDict[int, Session]" = OrderedDict()
+        self._session_bytes = sys.getsizeof(Session(history_size)) + sys.getsizeof(deque(maxlen=history_size))
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _lookup(self, user_id: int) -> Optional[Session]:
+        """The user's live session, marked as just used."""
+        session = self._sessions.get(user_id)
+        if session is None:
+            return None
+        now = time.monotonic()
+        if now - session.last_used > self.ttl:
+            self._drop(user_id)
+            self.expirations += 1
+            return None
+        session.last_used = now
+        self._sessions.move_to_end(user_id)
+        return session
+
+    def _session(self, user_id: int) -> Session:
+        session = self._lookup(user_id)
+        if session is None:
+            session = Session(self.history_size)
+            session.last_used = time.monotonic()
+            session.nbytes = self._session_bytes
+            self.nbytes += session.nbytes
+            self._sessions[user_id] = session
+        return session
+
+    def _resize(self, session: Session, delta: int) -> None:
+        session.nbytes += delta
+        self.nbytes += delta
+
+    def _drop(self, user_id: int) -> None:
+        session = self._sessions.pop(user_id)
+        self.nbytes -= session.nbytes
+
+    def _evict(self) -> None:
+        """Drop expired sessions, then least recently used ones until within the caps.
+
+        The user just touched is always the most recent, so it is never evicted.
+        """
+        now = time.monotonic()
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used > self.ttl:
+                self.expirations += 1
+            elif len(self._sessions) > self.maxsize or (
+                self.max_bytes and self.nbytes > self.max_bytes and len(self._sessions) > 1
+            ):
+                self.evictions += 1
+            else:
+                break
+            self._drop(user_id)
+
+    def get_project(self, user_id: int) -> Optional[Dict[str, Any]]:
+        session = self._lookup(user_id)
+        if session is not None and session.project is not None:
+            self.hits += 1
+            return session.project
+        self.misses += 1
+        return None
+
+    def peek_project(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """The cached project, if any, without counting a hit or miss."""
+        session = self._lookup(user_id)
+        return session.project if session is not None else None
+
+    def is_warm(self, user_id: int) -> bool:
+        """True if both the project and history are cached; not counted as a hit or miss."""
+        session = self._lookup(user_id)
+        return session is not None and session.project is not None and session.history_loaded
+
+    def set_project(self, user_id: int, project: Dict[str, Any]) -> None:
+        session = self._session(user_id)
+        old = _dict_bytes(session.project) if session.project is not None else 0
+        session.project = project
+        self._resize(session, _dict_bytes(project) - old)
+        self._evict()
+
+    def get_history(self, user_id: int, limit: int) -> Optional[List[Turn]]:
+        """Return the last ``limit`` cached turns, or None if they aren't all cached."""
+        session = self._lookup(user_id)
+        if session is not None and session.history_loaded and limit <= self.history_size:
+            self.hits += 1
+            return list(session.history)[-limit:]
+        self.misses += 1
+        return None
+
+    def set_history(self, user_id: int, history: List[Dict[str, str]]) -> List[Turn]:
+        """Replace the user's cached turns with ``history`` (role/content dicts) and return them."""
+        session = self._session(user_id)
+        self._resize(session, -sum(_turn_bytes(turn) for turn in session.history))
+        session.history.clear()
+        session.history.extend(Turn(turn["role"], turn["content"]) for turn in history)
+        session.history_loaded = True
+        self._resize(session, sum(_turn_bytes(turn) for turn in session.history))
+        self._evict()
+        return list(session.history)
+
+    def append_turn(self, user_id: int, role: str, content: str) -> None:
+        """Record a stored turn, if this user's history is already cached."""
+        session = self._lookup(user_id)
+        if session is not None and session.history_loaded:
+            history = session.history
+            if len(history) == history.maxlen:
+                self._resize(session, -_turn_bytes(history[0]))
+            turn = Turn(role, content)
+            history.append(turn)
+            self._resize(session, _turn_bytes(turn))
+            self._evict()
+
+    def invalidate(self, user_id: int) -> None:
+        if user_id in self._sessions:
+            self._drop(user_id)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self),
+            "turns": sum(len(session.history) for session in self._sessions.values()),
+            "bytes": self.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -17,6 +17,7 @@ def check_tables_exist():
         # Try to query the tables to verify they exist
         projects_exist = True
         conversations_exist = True
+        summaries_exist = True
         
         try:
             supabase.table("projects").select("id", count="exact").limit(1).execute()
@@ -32,7 +33,14 @@ def check_tables_exist():
             conversations_exist = False
             print(f"❌ Conversations table does not exist: {e}")
         
-        return projects_exist and conversations_exist
+        try:
+            supabase.table("project_summaries").select("project_id", count="exact").limit(1).execute()
+            print("✅ Project summaries table exists")
+        except Exception as e:
+            summaries_exist = False
+            print(f"❌ Project summaries table does not exist: {e}")
+        
+        return projects_exist and conversations_exist and summaries_exist
     
     except Exception as e:
         print(f"❌ Error checking tables: {e}")
@@ -66,11 +74,22 @@ def print_sql_instructions():
         timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
     );
     
+    CREATE TABLE IF NOT EXISTS project_summaries (
+        project_id INTEGER PRIMARY KEY REFERENCES projects(id),
+        user_id BIGINT NOT NULL,
+        summary TEXT NOT NULL,
+        summarized_until TIMESTAMP WITH TIME ZONE,
+        turns_summarized INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    );
+    
     CREATE INDEX IF NOT EXISTS idx_projects_user_id ON projects(user_id);
     CREATE INDEX IF NOT EXISTS idx_conversations_user_id ON conversations(user_id);
     CREATE INDEX IF NOT EXISTS idx_conversations_project_id ON conversations(project_id);
+    CREATE INDEX IF NOT EXISTS idx_conversations_project_timestamp ON conversations(project_id, timestamp);
     """)
     print("4. Run this script again to verify the tables exist")
+    print("Alternatively, set DATABASE_URL and run `python migrate.py up`, which also adds the query indexes and the chat_turn_context function")
     print("=====================================")
 
 if __name__ == "__main__":
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+sharding.py - Sharded deployment: one webhook front spreading updates over worker processes by user
+
+The front only reads the user id out of each webhook body and forwards the
+raw update to worker ``user_id % workers`` over a bounded local queue, so
+it stays cheap however busy the bot is. Every worker is a separate process
+running bot.py's Application and handlers on its own event loop and core.
+A user always lands on the same worker, so their updates keep their order
+(one FIFO queue, then PerUserUpdateProcessor) and that worker's in-process
+caches (session, summaries, rate limits, debounce) see all their traffic.
+
+    python sharding.py --workers 4
+"""
+
+import argparse
+import asyncio
+import hmac
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import secrets
+import signal
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Put on a shard's queue after its last update
+_STOP = None
+
+
+def raw_update_key(data: Dict[str, Any]) -> Optional[int]:
+    """The user a raw update belongs to, falling back to its chat, like ``scheduling.update_key``.
+
+    Telegram puts exactly one payload next to ``update_id`` (message,
+    callback_query, ...); its sender is ``from`` and its chat is ``chat``
+    or, for callback queries, ``message.chat``.
+    """
+    for field, payload in data.items():
+        if field == "update_id" or not isinstance(payload, dict):
+            continue
+        sender = payload.get("from") or payload.get("user")
+        if isinstance(sender, dict) and "id" in sender:
+            return sender["id"]
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return None
+
+
+def shard_for(key: Optional[int], shards: int) -> int:
+    # Updates with no user (rare service updates) all go to the first worker
+    return key % shards if key is not None else 0
+
+
+def _load_hook(path: str) -> Callable[[Any], Any]:
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+async def _serve_shard(
+    index: int,
+    updates: "multiprocessing.Queue",
+    reports: Optional["multiprocessing.Queue"],
+    prepare: Optional[str],
+    http_port: Optional[int],
+) -> Dict[str, Any]:
+    import bot as bot_module
+    from telegram import Update
+
+    request = _load_hook(prepare)(bot_module) if prepare else None
+    application = bot_module.build_application(request=request)
+    runner = None
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    if http_port:
+        from webhook import start_web_server
+
+        runner = await start_web_server(application, http_port)
+    await application.start()
+    logger.info(f"Shard {index} ready (pid {os.getpid()})")
+    if reports is not None:
+        reports.put({"shard": index, "ready": True})
+
+    loop = asyncio.get_running_loop()
+    received = 0
+    started = time.monotonic()
+    try:
+        while True:
+            # Blocking get on a thread; take whatever else is queued without another hop
+            batch = [await loop.run_in_executor(None, updates.get)]
+            while batch[-1] is not _STOP:
+                try:
+                    batch.append(updates.get_nowait())
+                except queue.Empty:
+                    break
+            for raw in batch:
+                if raw is _STOP:
+                    break
+                await application.update_queue.put(Update.de_json(json.loads(raw), application.bot))
+                received += 1
+            if batch[-1] is _STOP:
+                break
+        # Hand every queued update to a handler task while still running:
+        # stop() waits for those tasks, but not for ones created after it began
+        await application.update_queue.join()
+    finally:
+        await application.stop()
+        if application.post_stop:
+            await application.post_stop(application)
+        if runner is not None:
+            await runner.cleanup()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+
+    report: Dict[str, Any] = {
+        "shard": index,
+        "updates": received,
+        "seconds": round(time.monotonic() - started, 3),
+    }
+    if request is not None and hasattr(request, "stats"):
+        report["telegram"] = request.stats()
+    return report
+
+
+def worker_main(
+    index: int,
+    workers: int,
+    updates: "multiprocessing.Queue",
+    reports: Optional["multiprocessing.Queue"] = None,
+    prepare: Optional[str] = None,
+    http_port: Optional[int] = None,
+) -> None:
+    """Entry point of a shard process: run bot.py's handlers on updates from ``updates``.
+
+    ``prepare`` ("module:function") is called with the bot module before the
+    Application is built and may return a telegram ``BaseRequest`` to use
+    instead of the network, which is how bench/shard_bench.py runs offline.
+    """
+    # The front owns shutdown: it sends _STOP after the last update
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # Workers take updates only from the front; never poll or open a second web server
+    os.environ["BOT_MODE"] = "sharded"
+    # LLM_MAX_QPS is the account quota, so each shard gets its share
+    if float(os.environ.get("LLM_MAX_QPS", "0")) > 0:
+        os.environ["LLM_MAX_QPS"] = str(float(os.environ["LLM_MAX_QPS"]) / workers)
+    # Likewise Telegram's global flood limit; per-chat limits hold as is, since a user stays on one shard
+    telegram_rate = float(os.environ.get("TELEGRAM_MAX_MESSAGES_PER_SECOND", "30"))
+    if telegram_rate > 0:
+        os.environ["TELEGRAM_MAX_MESSAGES_PER_SECOND"] = str(telegram_rate / workers)
+
+    report = asyncio.run(_serve_shard(index, updates, reports, prepare, http_port))
+    if reports is not None:
+        reports.put(report)
+
+
+class ShardedFront:
+    """Starts ``workers`` shard processes and routes raw updates to them by user.
+
+    Each shard has a bounded queue; ``dispatch`` returns False instead of
+    blocking when it is full, so the webhook can answer 503 and Telegram
+    redelivers later. A shard process that dies is restarted on the same
+    queue, keeping the updates it had not taken yet.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        queue_size: int = 1000,
+        prepare: Optional[str] = None,
+        worker_port_base: Optional[int] = None,
+        collect_reports: bool = False,
+    ) -> None:
+        self.workers = workers
+        self.prepare = prepare
+        self.worker_port_base = worker_port_base
+        # Spawned, not forked: workers import bot.py fresh instead of inheriting the front's loop
+        self._context = multiprocessing.get_context("spawn")
+        self._queues = [self._context.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.reports = self._context.Queue() if collect_reports else None
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+        self.dispatched = [0] * workers
+        self.rejected = 0
+        self.restarts = 0
+        self.stopping = False
+
+    def _start_worker(self, index: int) -> None:
+        port = self.worker_port_base + index if self.worker_port_base else None
+        process = self._context.Process(
+            target=worker_main,
+            args=(index, self.workers, self._queues[index], self.reports, self.prepare, port),
+            name=f"shard-{index}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[index] = process
+
+    def start(self) -> None:
+        for index in range(self.workers):
+            self._start_worker(index)
+        logger.info(f"Started {self.workers} shard workers")
+
+    def dispatch(self, raw: bytes, key: Optional[int]) -> bool:
+        """Queue ``raw`` (an update's JSON) for ``key``'s shard; False if that shard is backed up."""
+        index = shard_for(key, self.workers)
+        try:
+            self._queues[index].put_nowait(raw)
+        except queue.Full:
+            self.rejected += 1
+            return False
+        self.dispatched[index] += 1
+        return True
+
+    def alive(self) -> bool:
+        return all(process is not None and process.is_alive() for process in self._processes)
+
+    def queue_depths(self) -> Dict[str, int]:
+        depths = {}
+        for index, shard_queue in enumerate(self._queues):
+            try:
+                depths[str(index)] = shard_queue.qsize()
+            except NotImplementedError:
+                # macOS has no sem_getvalue
+                pass
+        return depths
+
+    async def supervise(self, interval: float = 1.0) -> None:
+        """Restart shard processes that exit unexpectedly, until ``stop``."""
+        while not self.stopping:
+            for index, process in enumerate(self._processes):
+                if process is not None and not process.is_alive() and not self.stopping:
+                    logger.error(f"Shard {index} exited with code {process.exitcode}; restarting it")
+                    self.restarts += 1
+                    self._start_worker(index)
+            await asyncio.sleep(interval)
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Let every shard finish what it has queued, then exit; kill stragglers after ``timeout``."""
+        self.stopping = True
+        for shard_queue in self._queues:
+            await asyncio.to_thread(shard_queue.put, _STOP)
+        deadline = time.monotonic() + timeout
+        for index, process in enumerate(self._processes):
+            if process is None:
+                continue
+            await asyncio.to_thread(process.join, max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"Shard {index} did not finish within {timeout}s; terminating it")
+                process.terminate()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "alive": sum(1 for process in self._processes if process is not None and process.is_alive()),
+            "dispatched": sum(self.dispatched),
+            "rejected": self.rejected,
+            "restarts": self.restarts,
+        }
+
+
+def create_front_app(front: ShardedFront, webhook_path: str, secret_token: Optional[str]):
+    """aiohttp app that routes webhook updates to ``front`` and serves ``/health`` and ``/metrics``."""
+    from aiohttp import web
+
+    from webhook import SECRET_HEADER, metrics_endpoint
+
+    async def health(request: web.Request) -> web.Response:
+        alive = front.alive()
+        return web.json_response({"status": "ok" if alive else "degraded", **front.stats()}, status=200 if alive else 503)
+
+    async def receive_update(request: web.Request) -> web.Response:
+        if secret_token and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), secret_token):
+            return web.Response(status=403)
+        raw = await request.read()
+        try:
+            data = json.loads(raw)
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(data, dict):
+            return web.Response(status=400)
+        if not front.dispatch(raw, raw_update_key(data)):
+            # Telegram retries non-2xx deliveries
+            return web.Response(status=503)
+        return web.Response()
+
+    app = web.Application()
+    app.router.add_get("/", health)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_endpoint)
+    app.router.add_post(webhook_path, receive_update)
+    return app
+
+
+def register_front_metrics(front: ShardedFront) -> None:
+    metrics.register_gauge(
+        "shard_updates_total", "Updates routed to each shard", label="shard", kind="counter",
+        read=lambda: {str(index): count for index, count in enumerate(front.dispatched)},
+    )
+    metrics.register_gauge("shard_queue_depth", "Updates waiting for each shard", front.queue_depths, label="shard")
+    metrics.register_gauge("shard_rejected_total", "Updates refused because a shard queue was full", lambda: front.rejected, kind="counter")
+    metrics.register_gauge("shard_restarts_total", "Shard processes restarted after exiting", lambda: front.restarts, kind="counter")
+    metrics.register_gauge("shard_workers_alive", "Shard processes running", lambda: front.stats()["alive"])
+
+
+async def run_front(
+    front: ShardedFront,
+    port: int,
+    webhook_path: str,
+    secret_token: Optional[str],
+    webhook_url: Optional[str] = None,
+    token: Optional[str] = None,
+) -> None:
+    """Serve the front until SIGINT/SIGTERM, registering the webhook if ``webhook_url`` is set."""
+    from aiohttp import web
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    front.start()
+    register_front_metrics(front)
+    supervisor = asyncio.create_task(front.supervise(), name="shard-supervisor")
+    runner = web.AppRunner(create_front_app(front, webhook_path, secret_token))
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    logger.info(f"Sharded front listening on port {port} with {front.workers} workers")
+    try:
+        if webhook_url:
+            from telegram import Bot, Update
+
+            async with Bot(token) as bot:
+                await bot.set_webhook(
+                    url=webhook_url.rstrip("/") + webhook_path,
+                    secret_token=secret_token,
+                    allowed_updates=Update.ALL_TYPES,
+                )
+            logger.info(f"Receiving updates via webhook at {webhook_url.rstrip('/')}{webhook_path}")
+        await stop.wait()
+    finally:
+        # Stop taking updates first so nothing arrives after the shards' stop marker
+        await runner.cleanup()
+        await front.stop()
+        supervisor.cancel()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run Jeff Jr as a webhook front plus per-user shard workers")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("SHARD_WORKERS", "0")) or os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8080")))
+    parser.add_argument("--queue-size", type=int, default=int(os.environ.get("SHARD_QUEUE_SIZE", "1000")),
+                        help="Updates buffered per shard before the webhook answers 503")
+    parser.add_argument("--worker-port-base", type=int,
+                        default=int(os.environ["SHARD_WORKER_PORT_BASE"]) if os.environ.get("SHARD_WORKER_PORT_BASE") else None,
+                        help="Serve each worker's /health and /metrics on this port plus its index")
+    return parser.parse_args()
+
+
+def main() -> None:
+    # Load environment variables
+    load_dotenv()
+    logging.basicConfig(
+        format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
+    )
+    args = parse_args()
+
+    webhook_url = os.environ.get("WEBHOOK_URL")
+    if not webhook_url:
+        print("❌ Sharded mode receives updates by webhook: set WEBHOOK_URL (the public HTTPS base URL)")
+        raise SystemExit(1)
+    secret_token = os.environ.get("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+    if not os.environ.get("WEBHOOK_SECRET"):
+        logger.warning("WEBHOOK_SECRET is not set; generated a random one for this front.")
+
+    front = ShardedFront(args.workers, queue_size=args.queue_size, worker_port_base=args.worker_port_base)
+    asyncio.run(run_front(
+        front,
+        port=args.port,
+        webhook_path=os.environ.get("WEBHOOK_PATH", "/telegram"),
+        secret_token=secret_token,
+        webhook_url=webhook_url,
+        token=os.environ.get("TELEGRAM_TOKEN"),
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+summarizer.py - Rolling per-project conversation summaries, folded in the background
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from cachetools import TTLCache
+
+from prompts import build_summary_contents
+
+logger = logging.getLogger(__name__)
+
+
+class _Summary:
+    __slots__ = ("text", "summarized_until", "turns_summarized", "loaded", "new_turns", "folding")
+
+    def __init__(self) -> None:
+        self.text: Optional[str] = None
+        # Timestamp of the newest conversation row folded into ``text``
+        self.summarized_until: Optional[str] = None
+        self.turns_summarized = 0
+        self.loaded = False
+        self.new_turns = 0
+        self.folding = False
+
+
+class ConversationSummarizer:
+    """Keeps a compact summary of each project's older conversation.
+
+    Every ``every`` stored turns, the turns older than the most recent
+    ``keep_recent`` that the summary doesn't cover yet are folded into it
+    with one ``generate`` call and the result is upserted to the database.
+    Prompts then carry the summary plus recent turns, so their size stays
+    flat however long a founder keeps talking. Folding runs in the
+    background and never delays a reply; a failed fold is retried after the
+    next ``every`` turns.
+    """
+
+    def __init__(
+        self,
+        db: Any,
+        generate: Callable[[List[Dict[str, Any]]], Awaitable[str]],
+        every: int = 10,
+        keep_recent: int = 10,
+        max_fold: int = 40,
+        maxsize: int = 10000,
+        ttl: float = 3600.0,
+    ) -> None:
+        self.db = db
+        self.generate = generate
+        self.every = every
+        self.keep_recent = keep_recent
+        self.max_fold = max_fold
+        self._summaries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._tasks: Set[asyncio.Task] = set()
+        self.folds = 0
+        self.failed_folds = 0
+
+    def _entry(self, project_id: int) -> _Summary:
+        entry = self._summaries.get(project_id)
+        if entry is None:
+            entry = _Summary()
+        # Re-inserting refreshes the entry's TTL
+        self._summaries[project_id] = entry
+        return entry
+
+    async def _load(self, project_id: int, entry: _Summary) -> None:
+        if entry.loaded:
+            return
+        try:
+            row = await self.db.get_project_summary(project_id)
+        except Exception as e:
+            logger.warning(f"Could not load summary for project {project_id}: {e}")
+            row = None
+        self._apply(entry, row)
+
+    @staticmethod
+    def _apply(entry: _Summary, row: Optional[Dict[str, Any]]) -> None:
+        if row is not None:
+            entry.text = row.get("summary")
+            entry.summarized_until = row.get("summarized_until")
+            entry.turns_summarized = row.get("turns_summarized") or 0
+        entry.loaded = True
+
+    def prime(self, project_id: int, row: Optional[Dict[str, Any]]) -> None:
+        """Use a summary row (None if the project has none) fetched elsewhere instead of loading it."""
+        entry = self._entry(project_id)
+        if not entry.loaded:
+            self._apply(entry, row)
+
+    async def get(self, project_id: int) -> Optional[str]:
+        """The project's current summary, or None if nothing has been folded yet."""
+        entry = self._entry(project_id)
+        await self._load(project_id, entry)
+        return entry.text
+
+    def note_turn(self, project_id: int, user_id: int) -> None:
+        """Count a stored turn, starting a fold once ``every`` have accumulated."""
+        entry = self._entry(project_id)
+        entry.new_turns += 1
+        if entry.new_turns >= self.every and not entry.folding:
+            entry.new_turns = 0
+            entry.folding = True
+            task = asyncio.create_task(self._fold(project_id, user_id, entry), name=f"summarize-{project_id}")
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, project_id: int, user_id: int, entry: _Summary) -> None:
+        try:
+            await self._load(project_id, entry)
+            rows = await self.db.get_conversations_after(
+                project_id, entry.summarized_until, self.keep_recent + self.max_fold
+            )
+            to_fold = rows[:max(0, len(rows) - self.keep_recent)]
+            if len(to_fold) < self.every:
+                return
+            turns = [{"role": row["role"], "content": row["message"]} for row in to_fold]
+            text = (await self.generate(build_summary_contents(entry.text, turns))).strip()
+            if not text:
+                return
+            summarized_until = to_fold[-1]["timestamp"]
+            turns_summarized = entry.turns_summarized + len(to_fold)
+            await self.db.upsert_project_summary({
+                "project_id": project_id,
+                "user_id": user_id,
+                "summary": text,
+                "summarized_until": summarized_until,
+                "turns_summarized": turns_summarized,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            })
+            entry.text = text
+            entry.summarized_until = summarized_until
+            entry.turns_summarized = turns_summarized
+            self.folds += 1
+        except Exception as e:
+            self.failed_folds += 1
+            logger.error(f"Failed to summarize conversation for project {project_id}: {e}")
+        finally:
+            entry.folding = False
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "cached": len(self._summaries),
+            "folding": len(self._tasks),
+            "folds": self.folds,
+            "failed_folds": self.failed_folds,
+        }
+
+    async def close(self) -> None:
+        """Wait for folds in progress."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
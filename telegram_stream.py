@@ -0,0 +1,77 @@
+"""
+telegram_stream.py - Render a streamed reply into Telegram by editing a placeholder message
+"""
+
+import contextlib
+import logging
+import time
+from typing import AsyncGenerator, Tuple
+
+from telegram import Message
+from telegram.error import BadRequest
+
+from outbound import MAX_MESSAGE_LENGTH, split_message
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_TEXT = "🤔"
+# Appended when the stream breaks off after some text was shown, so a cut-off reply isn't read as complete
+INTERRUPTED_SUFFIX = "… (cut off, ask me again)"
+
+
+async def stream_reply(
+    message: Message,
+    chunks: AsyncGenerator[str, None],
+    error_text: str,
+    edit_interval: float = 1.0,
+) -> Tuple[str, bool]:
+    """Reply to ``message`` with a placeholder and grow it as ``chunks`` arrive.
+
+    Edits are sent at most once per ``edit_interval`` seconds to stay under
+    Telegram's per-chat edit limits; the complete text is always written by a
+    final edit, with any overflow past one message sent as follow-up
+    replies. ``chunks`` is closed before returning, however the stream ends.
+
+    Returns the text shown to the user and whether it is the whole reply.
+    If the stream fails, the text is what had arrived plus
+    ``INTERRUPTED_SUFFIX``; if no text arrived at all, it is ``error_text``.
+    """
+    placeholder = await message.reply_text(PLACEHOLDER_TEXT)
+    text = ""
+    shown = PLACEHOLDER_TEXT
+    last_edit = time.monotonic()
+
+    async def show(new_text: str) -> None:
+        nonlocal shown, last_edit
+        new_text = new_text[:MAX_MESSAGE_LENGTH]
+        if not new_text.strip() or new_text == shown:
+            return
+        try:
+            await placeholder.edit_text(new_text)
+            shown = new_text
+        except BadRequest as e:
+            # "Message is not modified" and friends shouldn't abort the stream
+            logger.warning(f"Skipping streamed edit: {e}")
+        last_edit = time.monotonic()
+
+    complete = True
+    try:
+        # Closing the stream as soon as we stop reading frees its LLM slot, even on errors
+        async with contextlib.aclosing(chunks):
+            async for chunk in chunks:
+                text += chunk
+                if time.monotonic() - last_edit >= edit_interval:
+                    await show(text)
+    except Exception as e:
+        logger.error(f"Error streaming AI response after {len(text)} chars: {e}")
+        complete = False
+        if text.strip():
+            text = text.rstrip() + INTERRUPTED_SUFFIX
+    if not text.strip():
+        # Failed before any text arrived, or the model returned none (e.g. blocked by safety filters)
+        text, complete = error_text, False
+    parts = split_message(text)
+    await show(parts[0])
+    for part in parts[1:]:
+        await message.reply_text(part)
+    return text, complete
@@ -0,0 +1,70 @@
+import asyncio
+
+from conversation_log import ConversationWriter, is_permanent_error
+
+
+class FakeAPIError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def rows(count, bad=()):
+    return [{"user_id": 1, "role": "user", "message": str(i), "bad": i in bad} for i in range(count)]
+
+
+def test_permanent_errors_are_told_apart_from_outages():
+    assert is_permanent_error(FakeAPIError("23502"))
+    assert is_permanent_error(FakeAPIError("PGRST204"))
+    assert not is_permanent_error(FakeAPIError("57014"))
+    assert not is_permanent_error(ConnectionError("reset"))
+
+
+def test_rejected_rows_are_isolated_and_dropped():
+    written = []
+
+    async def insert(batch):
+        if any(row["bad"] for row in batch):
+            raise FakeAPIError("23502")
+        written.extend(batch)
+
+    async def run():
+        writer = ConversationWriter(insert, batch_size=8)
+        for row in rows(10, bad={2, 5}):
+            writer.enqueue(row)
+        while writer.stats()["pending"]:
+            assert await writer._flush_batch()
+        return writer
+
+    writer = asyncio.run(run())
+    assert [row["message"] for row in written] == ["0", "1", "3", "4", "6", "7", "8", "9"]
+    assert writer.rows_rejected == 2
+    assert writer.retries == 0
+
+
+def test_outage_keeps_rows_queued_in_order():
+    async def insert(batch):
+        raise ConnectionError("reset")
+
+    async def run():
+        writer = ConversationWriter(insert, batch_size=2, max_retries=1, base_backoff=0.001)
+        for row in rows(3):
+            writer.enqueue(row)
+        assert not await writer._flush_batch()
+        return writer
+
+    writer = asyncio.run(run())
+    assert [row["message"] for row in writer.pending_for(1)] == ["0", "1", "2"]
+    assert writer.failed_flushes == 1
+    assert writer.rows_rejected == 0
+
+
+def test_pending_rows_are_capped():
+    async def insert(batch):
+        pass
+
+    writer = ConversationWriter(insert, batch_size=100, max_pending=5)
+    for row in rows(8):
+        writer.enqueue(row)
+    assert [row["message"] for row in writer.pending_for(1)] == ["3", "4", "5", "6", "7"]
+    assert writer.rows_dropped == 3
@@ -0,0 +1,68 @@
+import asyncio
+
+from persistence import StatePersistence, create_state_store
+
+
+class FlakyStore:
+    placeholder = "?"
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.writes = []
+
+    async def open(self):
+        pass
+
+    async def write(self, statements):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database is down")
+        self.writes.append(statements)
+
+    async def close(self):
+        pass
+
+
+def test_failed_write_is_retried_without_new_updates():
+    store = FlakyStore(failures=2)
+
+    async def run():
+        persistence = StatePersistence(store, flush_delay=0.01, max_backoff=0.05)
+        await persistence.update_user_data(1, {"name": "SwapCo"})
+        for _ in range(100):
+            if store.writes:
+                break
+            await asyncio.sleep(0.01)
+        return persistence
+
+    persistence = asyncio.run(run())
+    assert len(store.writes) == 1
+    assert persistence.failed_writes == 2
+
+
+def test_flush_skips_the_backoff_wait():
+    store = FlakyStore(failures=1)
+
+    async def run():
+        persistence = StatePersistence(store, flush_delay=0.01, max_backoff=60)
+        await persistence.update_user_data(1, {"name": "SwapCo"})
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(persistence.flush(), timeout=1)
+
+    asyncio.run(run())
+    assert len(store.writes) == 1
+
+
+def test_sqlite_store_round_trip(tmp_path):
+    async def run():
+        persistence = StatePersistence(create_state_store(f"sqlite:///{tmp_path / 'state.sqlite3'}"))
+        await persistence.get_user_data()
+        await persistence.update_conversation("onboarding", (1, 1), 2)
+        await persistence.update_user_data(1, {"name": "SwapCo"})
+        await persistence.flush()
+        reopened = StatePersistence(create_state_store(f"sqlite:///{tmp_path / 'state.sqlite3'}"))
+        return await reopened.get_conversations("onboarding"), await reopened.get_user_data()
+
+    conversations, user_data = asyncio.run(run())
+    assert conversations == {(1, 1): 2}
+    assert user_data == {1: {"name": "SwapCo"}}
@@ -0,0 +1,52 @@
+import time
+
+from response_cache import ResponseCache, normalize
+
+QUESTION = "How do I find my first ten paying customers?"
+
+
+def test_normalize():
+    assert normalize("  How do I RAISE a seed round?! ") == "how do i raise a seed round"
+
+
+def test_short_messages_are_not_cacheable():
+    cache = ResponseCache()
+    assert not cache.cacheable("yes")
+    assert cache.cacheable(QUESTION)
+
+
+def test_near_identical_question_hits():
+    cache = ResponseCache(threshold=0.8)
+    cache.put(QUESTION, "1:Idea", "Talk to fifty founders this week.")
+    assert cache.get("how do i find my first 10 paying customers", "1:Idea") == "Talk to fifty founders this week."
+    assert cache.get("What valuation should I raise my seed at?", "1:Idea") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_replies_never_cross_scopes():
+    cache = ResponseCache()
+    cache.put(QUESTION, "1:Idea", "For SwapCo: talk to DEX traders.")
+    assert cache.get(QUESTION, "2:Idea") is None
+    assert cache.get(QUESTION, "1:Launched") is None
+    assert cache.get(QUESTION, "1:Idea") == "For SwapCo: talk to DEX traders."
+
+
+def test_entries_expire(monkeypatch):
+    cache = ResponseCache(ttl=10)
+    cache.put(QUESTION, "1:Idea", "reply")
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+    assert cache.get(QUESTION, "1:Idea") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(maxsize=2)
+    questions = [f"{topic} is the question I keep asking" for topic in ("pricing", "hiring", "fundraising")]
+    cache.put(questions[0], "s", "a")
+    cache.put(questions[1], "s", "b")
+    assert cache.get(questions[0], "s") == "a"
+    cache.put(questions[2], "s", "c")
+    assert cache.get(questions[1], "s") is None
+    assert cache.get(questions[0], "s") == "a"
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,69 @@
+import asyncio
+
+from telegram_stream import INTERRUPTED_SUFFIX, stream_reply
+
+
+class FakeMessage:
+    def __init__(self):
+        self.sent = []
+
+    async def reply_text(self, text):
+        reply = FakeMessage()
+        reply.text = text
+        self.sent.append(reply)
+        return reply
+
+    async def edit_text(self, text):
+        self.text = text
+
+
+class Chunks:
+    """An async generator stand-in that records whether it was closed."""
+
+    def __init__(self, chunks, error=None):
+        self.chunks = list(chunks)
+        self.error = error
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.chunks:
+            return self.chunks.pop(0)
+        if self.error is not None:
+            raise self.error
+        raise StopAsyncIteration
+
+    async def aclose(self):
+        self.closed = True
+
+
+def run(chunks):
+    message = FakeMessage()
+    text, complete = asyncio.run(stream_reply(message, chunks, "error", edit_interval=0))
+    return message, text, complete
+
+
+def test_complete_stream():
+    chunks = Chunks(["Ship ", "it."])
+    message, text, complete = run(chunks)
+    assert (text, complete) == ("Ship it.", True)
+    assert message.sent[0].text == "Ship it."
+    assert chunks.closed
+
+
+def test_stream_cut_off_midway_is_marked_partial():
+    chunks = Chunks(["Ship "], error=ConnectionError("reset"))
+    message, text, complete = run(chunks)
+    assert not complete
+    assert text == "Ship" + INTERRUPTED_SUFFIX
+    assert message.sent[0].text == text
+    assert chunks.closed
+
+
+def test_stream_without_text_shows_the_error_reply():
+    for chunks in (Chunks([], error=ConnectionError("reset")), Chunks([])):
+        message, text, complete = run(chunks)
+        assert (text, complete) == ("error", False)
+        assert message.sent[0].text == "error"
@@ -0,0 +1,42 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from webhook import SECRET_HEADER, create_web_app
+
+
+class FakeApplication:
+    running = True
+    bot = None
+
+    def __init__(self):
+        self.update_queue = asyncio.Queue()
+
+
+async def post_all(bodies, secret="s3cret"):
+    application = FakeApplication()
+    async with TestClient(TestServer(create_web_app(application, "/telegram", "s3cret"))) as client:
+        statuses = []
+        for body in bodies:
+            response = await client.post("/telegram", data=body, headers={SECRET_HEADER: secret})
+            statuses.append(response.status)
+    return statuses, application.update_queue.qsize()
+
+
+def test_valid_update_is_queued():
+    statuses, queued = asyncio.run(post_all(['{"update_id": 1}']))
+    assert statuses == [200]
+    assert queued == 1
+
+
+def test_malformed_bodies_are_rejected():
+    bodies = ["not json", "[1, 2]", "null", '"update"', "{}"]
+    statuses, queued = asyncio.run(post_all(bodies))
+    assert statuses == [400] * len(bodies)
+    assert queued == 0
+
+
+def test_wrong_secret_is_forbidden():
+    statuses, queued = asyncio.run(post_all(['{"update_id": 1}'], secret="wrong"))
+    assert statuses == [403]
+    assert queued == 0
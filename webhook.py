@@ -0,0 +1,129 @@
+"""
+webhook.py - aiohttp server for webhook delivery of Telegram updates and health checks
+"""
+
+import asyncio
+import hmac
+import logging
+import signal
+from typing import Optional
+
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+APPLICATION_KEY = web.AppKey("application", Application)
+
+
+async def health(request: web.Request) -> web.Response:
+    application = request.app[APPLICATION_KEY]
+    status = 200 if application.running else 503
+    return web.json_response(
+        {"status": "ok" if application.running else "starting"}, status=status
+    )
+
+
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    return web.Response(
+        text=metrics.render(), content_type="text/plain", headers={"Cache-Control": "no-store"}
+    )
+
+
+def create_web_app(
+    application: Application,
+    webhook_path: Optional[str] = None,
+    secret_token: Optional[str] = None,
+) -> web.Application:
+    """Build the aiohttp app serving ``/health``, ``/metrics`` and, if ``webhook_path`` is set, updates."""
+    app = web.Application()
+    app[APPLICATION_KEY] = application
+    app.router.add_get("/", health)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics_endpoint)
+
+    if webhook_path:
+        async def receive_update(request: web.Request) -> web.Response:
+            if secret_token and not hmac.compare_digest(
+                request.headers.get(SECRET_HEADER, ""), secret_token
+            ):
+                return web.Response(status=403)
+            try:
+                data = await request.json()
+            except ValueError:
+                return web.Response(status=400)
+            # Valid JSON that isn't an update object would otherwise fail in de_json with a 500
+            if not isinstance(data, dict):
+                return web.Response(status=400)
+            try:
+                update = Update.de_json(data, application.bot)
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Rejecting malformed webhook update: {e!r}")
+                return web.Response(status=400)
+            await application.update_queue.put(update)
+            return web.Response()
+
+        app.router.add_post(webhook_path, receive_update)
+
+    return app
+
+
+async def start_web_server(
+    application: Application,
+    port: int,
+    webhook_path: Optional[str] = None,
+    secret_token: Optional[str] = None,
+) -> web.AppRunner:
+    """Start serving ``create_web_app`` on ``port``; call ``cleanup()`` on the result to stop."""
+    runner = web.AppRunner(create_web_app(application, webhook_path, secret_token))
+    await runner.setup()
+    await web.TCPSite(runner, "0.0.0.0", port).start()
+    logger.info(f"Web server listening on port {port}")
+    return runner
+
+
+async def run_webhook(
+    application: Application,
+    webhook_url: str,
+    port: int,
+    secret_token: str,
+    webhook_path: str = "/telegram",
+) -> None:
+    """Run ``application`` on webhook updates until SIGINT/SIGTERM.
+
+    Mirrors ``Application.run_polling``'s lifecycle, including the
+    ``post_init``/``post_stop``/``post_shutdown`` hooks. Every replica
+    registers the same URL and secret, so any number can run behind a
+    load balancer.
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await application.initialize()
+    if application.post_init:
+        await application.post_init(application)
+    runner = await start_web_server(application, port, webhook_path, secret_token)
+    try:
+        await application.bot.set_webhook(
+            url=webhook_url.rstrip("/") + webhook_path,
+            secret_token=secret_token,
+            allowed_updates=Update.ALL_TYPES,
+        )
+        await application.start()
+        logger.info(f"Receiving updates via webhook at {webhook_url.rstrip('/')}{webhook_path}")
+        await stop.wait()
+    finally:
+        await runner.cleanup()
+        if application.running:
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)